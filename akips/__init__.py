@@ -5,109 +5,322 @@ __version__ = '0.3.0'
 import io
 import re
 import logging
+import functools
+import random
+import sys
+import threading
+import time
 from datetime import datetime
 import requests
 import pytz
 import csv
-
+from urllib.parse import quote
+
+from akips import parser
+from akips import columnar as columnar_module
+from akips import records
+from akips.batch import Batch
+from akips.cache import AkipsCache
+from akips.metrics import RequestEvent, ParseEvent, command_verb
 from akips.exceptions import AkipsError
 
 # Logging configuration
 logger = logging.getLogger(__name__)
 
+# Longest URL-encoded command string sent in one request when batching names
+MAX_CMD_LENGTH = 2000
+
+# Longest URL-encoded entries list sent in one web_manual_grouping_bulk call.  Each
+# call loads and saves the grouping configuration once, so fewer, larger calls are
+# cheaper.  About 7 KB keeps the whole request line under the common 8 KB limit.
+MAX_BULK_GROUPING_LENGTH = 7000
+
+# HTTP status codes that mean the server is briefly unavailable and worth retrying
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+# Bytes read from the socket per iteration when streaming a response.  requests
+# defaults to 512, which costs a Python-level loop for every few lines.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Response bodies longer than this are truncated in debug logs
+DEBUG_BODY_LIMIT = 1024
+
+# Key attributes returned by get_devices and iter_devices
+DEVICE_ATTRIBUTES = [
+    'ip4addr',
+    'SNMPv2-MIB.sysName',
+    'SNMPv2-MIB.sysDescr',
+    'SNMPv2-MIB.sysLocation'
+]
+
+
+def _instrumented(func):
+    """
+    Report the parsing done by a public reader to the registered observers.
+    Parse time is the call's run time minus the time spent in HTTP requests.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if not self.observers or getattr(self._local, 'requests', None) is not None:
+            return func(self, *args, **kwargs)
+        self._local.requests = []
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_made = self._local.requests
+            self._local.requests = None
+        if requests_made:
+            http_seconds = sum(event.seconds for event in requests_made)
+            self._notify('on_parse', ParseEvent(
+                method=func.__name__,
+                verb=requests_made[0].verb,
+                lines=sum(event.lines for event in requests_made),
+                seconds=max(elapsed - http_seconds, 0.0)))
+        return result
+    return wrapper
+
 
 class AKIPS:
-    """ Class to handle interactions with AKiPS API """
+    """
+    Class to handle interactions with AKiPS API
+
+    One instance may be shared by a pool of worker threads.  Requests go through
+    a single requests.Session whose connection pool holds pool_maxsize
+    connections, so set it to at least the number of threads sharing the client.
+    """
 
     def __init__(self, server, username='api-ro', password=None,
-                 verify=True, timezone='America/New_York'):
+                 verify=True, timezone='America/New_York', cache=None, observers=None,
+                 timeout=30, pool_connections=10, pool_maxsize=10, retries=3,
+                 backoff_factor=0.5, backoff_max=30, retry_writes=False):
+        """
+        A cache object may be passed to share or customize result caching, see
+        `akips.cache.AkipsCache` for the interface and default time to live values.
+
+        Observers receive timing, size and error details for every request, see
+        `akips.metrics.RequestObserver` and `akips.metrics.MetricsCollector`.
+
+        timeout is the default request timeout in seconds, either one number or a
+        (connect, read) tuple.  Failed connections, timeouts and 429/502/503/504
+        responses are retried up to retries times, sleeping a random time of up
+        to backoff_factor * 2 ** attempt seconds (capped at backoff_max) between
+        attempts.  Reads are always retried.  Site script calls that change AKiPS
+        are only retried when retry_writes is True.
+        """
         self.server = server
+        # A bare host name means https, a full URL (e.g. a local test server) is used as given
+        self.base_url = server.rstrip('/') if '://' in server else 'https://' + server
         self.username = username
         self.password = password
         self.verify = verify
         self.server_timezone = timezone
+        self._tzinfo = None
+        self.cache = cache if cache is not None else AkipsCache()
+        self.observers = list(observers or [])
+        self.debug_body_limit = DEBUG_BODY_LIMIT
+        self._local = threading.local()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.retry_writes = retry_writes
+        self.pool_maxsize = pool_maxsize
         self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
         if not verify:
             requests.packages.urllib3.disable_warnings()    # pylint: disable=no-member
 
-    def get_devices(self, group_filter='any', groups=[]):
+    def add_observer(self, observer):
+        """
+        Register an instrumentation observer.
+        """
+        self.observers.append(observer)
+
+    def batch(self, max_workers=None):
+        """
+        Return a Batch that queues reader calls and runs them concurrently,
+        see `akips.batch.Batch`.  At most max_workers requests are in flight,
+        by default pool_maxsize.
+        """
+        return Batch(self, max_workers=max_workers)
+
+    def _notify(self, hook, event):
+        """
+        Pass an event to every observer.  A failing observer is logged and never
+        interrupts the API call.
+        """
+        for observer in self.observers:
+            try:
+                getattr(observer, hook)(event)
+            except Exception:   # pylint: disable=broad-except
+                logger.exception("akips observer {} failed".format(observer))
+
+    def _record_request(self, event):
+        """
+        Report a finished HTTP request to the observers.
+        """
+        requests_made = getattr(self._local, 'requests', None)
+        if requests_made is not None:
+            requests_made.append(event)
+        self._notify('on_request', event)
+
+    @property
+    def tzinfo(self):
+        """
+        The server timezone, resolved once and reused for every epoch conversion.
+        """
+        if self._tzinfo is None or self._tzinfo.zone != self.server_timezone:
+            self._tzinfo = pytz.timezone(self.server_timezone)
+        return self._tzinfo
+
+    @_instrumented
+    def get_devices(self, group_filter='any', groups=[], use_cache=False, as_records=False):
         """
         Pull a list of key attributes for multiple devices.  Can be filtered by group
-        but the default is all devices.
+        but the default is all devices.  With use_cache=True a recent result may be
+        returned from the cache.  With as_records=True the values are
+        `akips.records.Device` objects instead of dictionaries.
 
         AKiPS command syntax:
             `mget {type} [{parent regex} [{child regex} [{attribute regex}]]]
                 [value {text|/regex/|integer|ipaddr}] [profile {profile name}]
                 [any|all|not group {group name} ...]`
         """
-        attributes = [
-            'ip4addr',
-            'SNMPv2-MIB.sysName',
-            'SNMPv2-MIB.sysDescr',
-            'SNMPv2-MIB.sysLocation'
-        ]
-        cmd_attributes = "|".join(attributes)
-        params = {
-            'cmds': f'mget text * sys /{cmd_attributes}/',
-        }
-        if groups:
-            # [any|all|not group {group name} ...]
-            group_list = " ".join(groups)
-            params['cmds'] += f" {group_filter} group {group_list}"
+        cache_key = (group_filter, tuple(groups), as_records)
+        if use_cache:
+            hit, data = self.cache.get('get_devices', cache_key)
+            if hit:
+                return data
+        params = self._devices_params(group_filter, groups)
         text = self._get(params=params)
         if text:
             data = {}
             # Data comes back as 'plain/text' type so we have to parse it
-            lines = text.split('\n')
-            for line in lines:
-                match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s=\s(.*)$', line)
-                if match:
-                    if match.group(1) not in data:
-                        # Populate a default entry for all desired fields
-                        data[match.group(1)] = dict.fromkeys(attributes)
-                    # Save this attribute value to data
-                    data[match.group(1)][match.group(3)] = match.group(4)
+            for parent, child, attribute, value in parser.parse_mget(text.split('\n')):
+                if parent not in data:
+                    # Populate a default entry for all desired fields
+                    data[parent] = dict.fromkeys(DEVICE_ATTRIBUTES)
+                # Save this attribute value to data
+                data[parent][attribute] = value
             logger.debug("Found {} devices in akips".format(len(data.keys())))
+            if as_records:
+                data = {name: records.Device.from_attributes(name, entry) for name, entry in data.items()}
+            if use_cache:
+                self.cache.set('get_devices', cache_key, data)
             return data
         return None
 
-    def get_device(self, name):
+    def iter_devices(self, group_filter='any', groups=[], as_records=False):
+        """
+        Streaming variant of get_devices.  Yields a (name, attributes) tuple for each
+        device as soon as all of its lines have been received, so memory use stays
+        bounded no matter how many devices are returned.  With as_records=True an
+        `akips.records.Device` is yielded instead of the tuple.
+
+        AKiPS groups mget output by parent, so each device is yielded once.
+        """
+        params = self._devices_params(group_filter, groups)
+        name = None
+        entry = None
+        for parent, child, attribute, value in parser.parse_mget(self._iter_lines(params=params)):
+            if parent != name:
+                if name is not None:
+                    yield records.Device.from_attributes(name, entry) if as_records else (name, entry)
+                name = parent
+                entry = dict.fromkeys(DEVICE_ATTRIBUTES)
+            entry[attribute] = value
+        if name is not None:
+            yield records.Device.from_attributes(name, entry) if as_records else (name, entry)
+
+    def _devices_params(self, group_filter, groups):
+        """
+        Build the mget command shared by get_devices and iter_devices.
+        """
+        cmd_attributes = "|".join(DEVICE_ATTRIBUTES)
+        params = {
+            'cmds': f'mget text * sys /{cmd_attributes}/',
+        }
+        if groups:
+            # [any|all|not group {group name} ...]
+            group_list = " ".join(groups)
+            params['cmds'] += f" {group_filter} group {group_list}"
+        return params
+
+    @_instrumented
+    def get_device(self, name, use_cache=False):
         """
-        Pull the entire configuration for a single device.
+        Pull the entire configuration for a single device.  With use_cache=True a
+        recent result may be returned from the cache.
 
         AKiPS command syntax:
             `mget {type} [{parent regex} [{child regex} [{attribute regex}]]]
                 [value {text|/regex/|integer|ipaddr}] [profile {profile name}]
                 [any|all|not group {group name} ...]`
         """
+        cache_key = name
+        if use_cache:
+            hit, data = self.cache.get('get_device', cache_key)
+            if hit:
+                return data
         params = {
             'cmds': f'mget * {name} * *'
         }
         text = self._get(params=params)
         if text:
             data = {}
-            # Data comes back as 'plain/text' type so we have to parse it.  Example:
-            lines = text.split('\n')
-            for line in lines:
-                match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s=(\s(.*))?$', line)
-                if match:
-                    name = match.group(1)
-                    if match.group(2) not in data:
-                        # initialize the dict of attributes
-                        data[match.group(2)] = {}
-                    if match.group(5):
-                        # Save this attribute value to data
-                        data[match.group(2)][match.group(3)] = match.group(5)
-                    else:
-                        # save a blank string if there was nothing after equals
-                        data[match.group(2)][match.group(3)] = ''
+            # Data comes back as 'plain/text' type so we have to parse it.
+            # A blank string is saved if there was nothing after equals.
+            for name, child, attribute, value in parser.parse_mget(text.split('\n')):
+                if child not in data:
+                    # initialize the dict of attributes
+                    data[child] = {}
+                data[child][attribute] = value
             if name:
                 data['name'] = name
             logger.debug("Found device {} in akips".format(data))
+            if use_cache:
+                self.cache.set('get_device', cache_key, data)
             return data
         return None
 
+    @_instrumented
+    def get_devices_detail(self, names, attributes=None, max_cmd_length=MAX_CMD_LENGTH):
+        """
+        Pull the configuration for many devices using as few requests as possible.
+        Device names are combined into alternation regexes, split into chunks that
+        keep each command under max_cmd_length URL-encoded characters.  Returns a
+        dictionary keyed by device name, where each value has the same shape as
+        the result of get_device.  Devices that are not found are left out.
+
+        AKiPS command syntax:
+            `mget {type} [{parent regex} [{child regex} [{attribute regex}]]]
+                [value {text|/regex/|integer|ipaddr}] [profile {profile name}]
+                [any|all|not group {group name} ...]`
+        """
+        names = list(names)
+        cmd_attributes = _regex_alternation(attributes) if attributes else '*'
+        prefix = 'mget * '
+        suffix = f' * {cmd_attributes}'
+        data = {}
+        for chunk in _chunk_alternations(names, max_cmd_length - _encoded_length(prefix + suffix)):
+            params = {
+                'cmds': prefix + _regex_alternation(chunk) + suffix
+            }
+            text = self._get(params=params)
+            if text:
+                for parent, child, attribute, value in parser.parse_mget(text.split('\n')):
+                    device = data.setdefault(parent, {'name': parent})
+                    device.setdefault(child, {})[attribute] = value
+        logger.debug("Found {} of {} devices in akips".format(len(data), len(names)))
+        return data
+
+    @_instrumented
     def get_device_by_ip(self, ipaddr, use_cache=True):
         """
         Devices may have additional IP addresses recorded in akips, but only one primary
@@ -115,26 +328,59 @@ class AKIPS:
 
         AKiPS user "api-rw" is required to run api scripts.  This call makes use of a
         special site script and not the normal web API commands.
+
+        With use_cache=True a previously found device name may be returned from
+        the cache.  Lookups that find nothing are not cached.
         """
+        if use_cache:
+            hit, device_name = self.cache.get('get_device_by_ip', ipaddr)
+            if hit:
+                return device_name
         params = {
             'function': 'web_find_device_by_ip',
             'ipaddr': ipaddr
         }
-        text = self._get(section='/api-script/', params=params)
+        text = self._get(section='/api-script/', params=params, idempotent=True)
         if text:
             lines = text.split('\n')
             for line in lines:
-                match = re.match(r"IP Address (\S+) is configured on (\S+)", line)
+                match = parser.IP_LOOKUP_PATTERN.match(line)
                 if match:
                     address = match.group(1)
                     device_name = match.group(2)
                     logger.debug(f"Found {address} on device {device_name}")
+                    if use_cache:
+                        self.cache.set('get_device_by_ip', ipaddr, device_name)
                     return device_name
         return None
 
-    def get_unreachable(self):
+    @_instrumented
+    def get_ip_mapping(self):
+        """
+        Pull every IP address known to AKiPS and the device it is configured on,
+        as a dictionary of address to device name.  When an address is on more
+        than one device the first one listed is kept, as with get_device_by_ip.
+        See `akips.ipindex.IPIndex` for a refreshing local index built on this.
+
+        AKiPS user "api-rw" is required to run api scripts.  This call makes use of the
+        web_export_ip2name site script and not the normal web API commands.
+        """
+        params = {
+            'function': 'web_export_ip2name'
+        }
+        data = {}
+        for line in self._iter_lines(section='/api-script/', params=params, idempotent=True):
+            fields = line.split(',')
+            if len(fields) >= 2 and fields[0] and fields[1]:
+                data.setdefault(fields[0], fields[1])
+        logger.debug("Found {} IP address mappings in akips".format(len(data)))
+        return data
+
+    @_instrumented
+    def get_unreachable(self, as_records=False):
         """
-        Pull a list of unreachable IPv4 ping devices
+        Pull a list of unreachable IPv4 ping devices.  With as_records=True the
+        values are `akips.records.UnreachableDevice` objects instead of dictionaries.
 
         AKiPS command syntax:
             `mget {type} [{parent regex} [{child regex} [{attribute regex}]]]
@@ -147,78 +393,92 @@ class AKIPS:
         text = self._get(params=params)
         data = {}
         if text:
-            lines = text.split('\n')
-            for line in lines:
-                match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s=\s(\S+),(\S+),(\S+),(\S+),(\S+)?$', line)
-                if match:
-                    # epoch fields are in the server's timezone
-                    name = match.group(1)
-                    attribute = match.group(3)
-                    event_start = datetime.fromtimestamp(
-                        int(match.group(7)), tz=pytz.timezone(self.server_timezone))
-                    if name not in data:
-                        # populate a starting point for this device
-                        data[name] = {
-                            'name': name,
-                            'ping_state': 'n/a',
-                            'snmp_state': 'n/a',
-                            'event_start': event_start  # epoch in local timezone
-                        }
-                    if attribute == 'PING.icmpState':
-                        data[name]['child'] = match.group(2),
-                        data[name]['ping_state'] = match.group(5)
-                        data[name]['index'] = match.group(4)
-                        data[name]['device_added'] = datetime.fromtimestamp(
-                            int(match.group(6)), tz=pytz.timezone(self.server_timezone))
-                        data[name]['event_start'] = datetime.fromtimestamp(
-                            int(match.group(7)), tz=pytz.timezone(self.server_timezone))
-                        data[name]['ip4addr'] = match.group(8)
-                    elif attribute == 'SNMP.snmpState':
-                        data[name]['child'] = match.group(2),
-                        data[name]['snmp_state'] = match.group(5)
-                        data[name]['index'] = match.group(4)
-                        data[name]['device_added'] = datetime.fromtimestamp(
-                            int(match.group(6)), tz=pytz.timezone(self.server_timezone))
-                        data[name]['event_start'] = datetime.fromtimestamp(
-                            int(match.group(7)), tz=pytz.timezone(self.server_timezone))
-                        data[name]['ip4addr'] = None
-                    if event_start < data[name]['event_start']:
-                        data[name]['event_start'] = event_start
+            # epoch fields are in the server's timezone
+            tzinfo = self.tzinfo
+            for name, child, attribute, value in parser.parse_mget(text.split('\n')):
+                fields = parser.split_enum(value)
+                if not fields or not all(fields[:4]):
+                    continue
+                event_start = int(fields[3])
+                if name not in data:
+                    # populate a starting point for this device
+                    data[name] = records.UnreachableDevice(name, event_start_epoch=event_start, tzinfo=tzinfo)
+                entry = data[name]
+                if attribute == 'PING.icmpState':
+                    entry.child = child
+                    entry.ping_state = fields[1]
+                    entry.index = fields[0]
+                    entry.device_added_epoch = int(fields[2])
+                    entry.event_start_epoch = event_start
+                    entry.ip4addr = fields[4] or None
+                elif attribute == 'SNMP.snmpState':
+                    entry.child = child
+                    entry.snmp_state = fields[1]
+                    entry.index = fields[0]
+                    entry.device_added_epoch = int(fields[2])
+                    entry.event_start_epoch = event_start
+                    entry.ip4addr = None
+                if event_start < entry.event_start_epoch:
+                    entry.event_start_epoch = event_start
             logger.debug("Found {} devices in akips".format(len(data)))
+            if not as_records:
+                data = {name: entry.to_dict() for name, entry in data.items()}
             logger.debug("data: {}".format(data))
 
         return data
 
-    def get_group_membership(self, device='*', group_filter='any', groups=[]):
+    @_instrumented
+    def get_group_membership(self, device='*', group_filter='any', groups=[], use_cache=False):
         """
         Pull a list of device names to group memberships.  Defaults to all devices
-        and all groups (including the special 'maintenance_mode' group).
+        and all groups (including the special 'maintenance_mode' group).  With
+        use_cache=True a recent result may be returned from the cache.
 
         AKiPS command syntax:
             `mgroup {type} [{parent regex}]
                 [any|all|not group {group name} ...]`
         """
-        params = {
-            'cmds': f'mgroup {device} *',
-        }
-        if groups:
-            group_list = " ".join(groups)
-            params['cmds'] += f" {group_filter} group {group_list}"
+        cache_key = (device, group_filter, tuple(groups))
+        if use_cache:
+            hit, data = self.cache.get('get_group_membership', cache_key)
+            if hit:
+                return data
+        params = self._group_membership_params(device, group_filter, groups)
         text = self._get(params=params)
         if text:
             data = {}
             # Data comes back as 'plain/text' type so we have to parse it
-            lines = text.split('\n')
-            for line in lines:
-                match = re.match(r'^(\S+)\s=\s(.*)$', line)
-                if match:
-                    if match.group(1) not in data:
-                        # Populate a default entry for all desired fields
-                        data[match.group(1)] = match.group(2).split(',')
+            for name, groups in parser.parse_mgroup(text.split('\n')):
+                if name not in data:
+                    # Populate a default entry for all desired fields
+                    data[name] = groups
             logger.debug("Found {} device and group mappings in akips".format(len(data.keys())))
+            if use_cache:
+                self.cache.set('get_group_membership', cache_key, data)
             return data
         return None
 
+    def iter_group_membership(self, device='*', group_filter='any', groups=[]):
+        """
+        Streaming variant of get_group_membership.  Yields a (name, groups) tuple
+        for each device as the response is received.
+        """
+        params = self._group_membership_params(device, group_filter, groups)
+        yield from parser.parse_mgroup(self._iter_lines(params=params))
+
+    def _group_membership_params(self, device, group_filter, groups):
+        """
+        Build the mgroup command shared by get_group_membership and iter_group_membership.
+        """
+        params = {
+            'cmds': f'mgroup {device} *',
+        }
+        if groups:
+            group_list = " ".join(groups)
+            params['cmds'] += f" {group_filter} group {group_list}"
+        return params
+
+    @_instrumented
     def set_group_membership(self, device, group, mode):
         """
         Update manual grouping rules for a device, including the special
@@ -242,25 +502,135 @@ class AKIPS:
             'device': device   # device_name
         }
         text = self._get(section='/api-script/', params=params)
+        self._invalidate_groups()
         if text:
             logger.error("Web API request failed: {}".format(text))
             raise AkipsError(message=text)
         return None
 
-    def get_status(self, device='*', child='*', attribute='*'):
+    @_instrumented
+    def set_group_memberships(self, items, max_cmd_length=MAX_BULK_GROUPING_LENGTH):
+        """
+        Update manual grouping rules for many devices.  items is a sequence of
+        (device, group, mode) tuples where mode is 'assign' or 'clear'.  Entries are
+        sent in as few site script calls as fit under max_cmd_length (about 200
+        entries per call by default), and the server loads and saves the grouping
+        configuration once per call.  Raise max_cmd_length if the AKiPS web server
+        accepts longer request URLs.
+
+        Returns a list with one dictionary per item, in the same order, holding
+        'device', 'group', 'mode', 'ok' and 'error' keys.  The list is returned even
+        when a call fails: items of the failed call get an error such as
+        'request failed: ReadTimeout' (they may or may not have been applied) and
+        items of later calls, which are not sent, get 'not sent'.
+
+        AKiPS user "api-rw" is required to run api scripts.  This call makes use of
+        the web_manual_grouping_bulk site script and not the normal web API commands.
+        """
+        items = list(items)
+        entries = []
+        for device, group, mode in items:
+            if not device:
+                raise ValueError("a valid device name must be provided for manual grouping update")
+            if not group:
+                raise ValueError("a valid group name must be provided for manual grouping update")
+            if mode not in ('assign', 'clear'):
+                raise ValueError("mode must be 'assign' or 'clear' for manual grouping update")
+            for value in (device, group):
+                if re.search(r'[\s,]', value):
+                    raise ValueError(f"invalid character in manual grouping value: {value!r}")
+            entries.append(f'{mode},{group},{device}')
+
+        results = {}
+        failure = None
+        try:
+            for chunk in _chunk_by_size(entries, max_cmd_length,
+                                        lambda entry: _encoded_length(entry + '\n')):
+                if failure:
+                    results.update((entry, 'not sent') for entry in chunk)
+                    continue
+                params = {
+                    'function': 'web_manual_grouping_bulk',
+                    'type': 'device',
+                    'entries': '\n'.join(chunk)
+                }
+                try:
+                    text = self._get(section='/api-script/', params=params)
+                    for line in text.split('\n'):
+                        match = parser.BULK_GROUPING_PATTERN.match(line)
+                        if match:
+                            entry = f'{match.group(2)},{match.group(3)},{match.group(4)}'
+                            results[entry] = match.group(5) if match.group(1) == 'ERROR' else None
+                        elif line:
+                            logger.error("Web API request failed: {}".format(text))
+                            raise AkipsError(message=text)
+                except (AkipsError, requests.exceptions.RequestException) as err:
+                    # Earlier chunks are applied, keep their results and report this one
+                    failure = f'request failed: {type(err).__name__}'
+                    results.update((entry, failure) for entry in chunk if entry not in results)
+        finally:
+            self._invalidate_groups()
+
+        data = []
+        for entry, (device, group, mode) in zip(entries, items):
+            error = results[entry] if entry in results else 'no result returned'
+            data.append({
+                'device': device,
+                'group': group,
+                'mode': mode,
+                'ok': error is None,
+                'error': error,
+            })
+        logger.debug("Updated {} of {} manual grouping entries".format(
+            sum(1 for item in data if item['ok']), len(data)))
+        return data
+
+    def _invalidate_groups(self):
+        """
+        Drop cached results that depend on group membership after a grouping change.
+        Device patterns are AKiPS regexes, so every membership entry is dropped
+        along with device lists that were filtered by group.
+        """
+        self.cache.invalidate('get_group_membership')
+        self.cache.invalidate('get_devices', predicate=lambda key: bool(key[1]))
+
+    @_instrumented
+    def get_status(self, device='*', child='*', attribute='*', group_filter='any', groups=[],
+                   profile=None):
         """
-        Pull the status values we are most interested in
+        Pull the status values we are most interested in.  Every enum type
+        attribute matching the filters (ifOperStatus, icmpState, snmpState, ...)
+        is read in a single streamed mget.  Returns a dictionary keyed by
+        (parent, child, attribute) with `akips.records.EnumValue` values.  Pass
+        two results to `diff_status` to find the states that changed.
 
         AKiPS command syntax:
             `mget {type} [{parent regex} [{child regex} [{attribute regex}]]]
                 [value {text|/regex/|integer|ipaddr}] [profile {profile name}]
                 [any|all|not group {group name} ...]`
         """
-        pass
+        params = {
+            'cmds': f'mget enum {device} {child} {attribute}'
+        }
+        if profile:
+            params['cmds'] += f" profile {profile}"
+        if groups:
+            group_list = " ".join(groups)
+            params['cmds'] += f" {group_filter} group {group_list}"
+        tzinfo = self.tzinfo
+        data = {}
+        for parent, child_name, attribute_name, value in parser.parse_mget(self._iter_lines(params=params)):
+            entry = records.EnumValue.from_string(value, tzinfo=tzinfo)
+            if entry is not None:
+                data[(sys.intern(parent), child_name, sys.intern(attribute_name))] = entry
+        logger.debug("Found {} status values in akips".format(len(data)))
+        return data
 
-    def get_events(self, event_type='all', period='last1h'):
+    @_instrumented
+    def get_events(self, event_type='all', period='last1h', as_records=False):
         """
-        Pull a list of events.
+        Pull a list of events.  With as_records=True the list holds
+        `akips.records.Event` objects instead of dictionaries.
 
         AKiPS command syntax:
             `mget event {all,critical,enum,threshold,uptime}
@@ -273,43 +643,54 @@ class AKIPS:
         }
         text = self._get(params=params)
         if text:
-            data = []
-            lines = text.split('\n')
-            for line in lines:
-                match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(.*)$', line)
-                if match:
-                    entry = {
-                        'epoch': match.group(1),
-                        'parent': match.group(2),
-                        'child': match.group(3),
-                        'attribute': match.group(4),
-                        'type': match.group(5),
-                        'flags': match.group(6),
-                        'details': match.group(7),
-                    }
-                    data.append(entry)
+            data = list(self._events(text.split('\n'), as_records))
             logger.debug("Found {} events of type {} in akips".format(len(data), type))
             return data
         return None
 
+    def iter_events(self, event_type='all', period='last1h', as_records=False):
+        """
+        Streaming variant of get_events.  Yields each event dictionary (or
+        `akips.records.Event` with as_records=True) as the response is received.
+        """
+        params = {
+            'cmds': f'mget event {event_type} time {period}'
+        }
+        yield from self._events(self._iter_lines(params=params), as_records)
+
+    def _events(self, lines, as_records):
+        """
+        Parse event lines into dictionaries or Event records.
+        """
+        if not as_records:
+            return parser.parse_events(lines)
+        tzinfo = self.tzinfo
+        return (records.Event(*fields, tzinfo=tzinfo) for fields in parser.split_events(lines))
+
     # Time-series commands
 
+    @_instrumented
     def get_series(self, period='last1h', device='*', attribute='*', get_dict=True,
-                   group_filter='any', groups=[]):
+                   group_filter='any', groups=[], columnar=False):
         """
         Pull a series of counter values.
 
+        With columnar=True the response is streamed into a
+        `akips.columnar.SeriesTable`, holding a float64 values array, a shared
+        timestamp index and parallel parent/child/attribute arrays.  This
+        requires numpy.
+
         AKiPS command syntax:
             `cseries avg
             time {time filter} type parent child attribute
             [any|all|not group {group name} ...]`
         """
-        params = {
-            'cmds': f'cseries avg time {period} * {device} * {attribute}'
-        }
-        if groups:
-            group_list = " ".join(groups)
-            params['cmds'] += f" {group_filter} group {group_list}"
+        params = self._series_params(period, device, attribute, group_filter, groups)
+        if columnar:
+            columnar_module.require_numpy()
+            table = columnar_module.SeriesTable.from_lines(self._iter_lines(params=params))
+            logger.debug("Found {} series entries".format(len(table) if table else 0))
+            return table
         text = self._get(params=params)
         if text:
             # Parse output in CSV format
@@ -325,10 +706,39 @@ class AKIPS:
             return csv_to_list
         return None
 
+    def iter_series(self, period='last1h', device='*', attribute='*', get_dict=True,
+                    group_filter='any', groups=[]):
+        """
+        Streaming variant of get_series.  Yields each CSV row as it is received,
+        either as a dictionary keyed by column header or as a list (the first
+        list yielded is the header row).
+        """
+        params = self._series_params(period, device, attribute, group_filter, groups)
+        lines = self._iter_lines(params=params)
+        if get_dict:
+            yield from csv.DictReader(lines)
+        else:
+            yield from csv.reader(lines)
+
+    def _series_params(self, period, device, attribute, group_filter, groups):
+        """
+        Build the cseries command shared by get_series and iter_series.
+        """
+        params = {
+            'cmds': f'cseries avg time {period} * {device} * {attribute}'
+        }
+        if groups:
+            group_list = " ".join(groups)
+            params['cmds'] += f" {group_filter} group {group_list}"
+        return params
+
+    @_instrumented
     def get_aggregate(self, period='last1h', device='*', attribute='*',
-                      operator='avg', interval='300', group_filter='any', groups=[]):
+                      operator='avg', interval='300', group_filter='any', groups=[],
+                      as_array=False):
         """
-        Aggregate counter values in intervals over a period of time.
+        Aggregate counter values in intervals over a period of time.  With
+        as_array=True the values are returned as a numpy float64 array.
 
         AKiPS command syntax:
             `aggregate interval {avg|total seconds}
@@ -341,68 +751,267 @@ class AKIPS:
         if groups:
             group_list = " ".join(groups)
             params['cmds'] += f" {group_filter} group {group_list}"
+        if as_array:
+            columnar_module.require_numpy()
         text = self._get(params=params)
         if text:
             # Text should be one CSV line followed by one blank line
             lines = text.split('\n')
             values = lines[0].split(',')
             logger.debug("Found {} aggregate values".format(len(values)))
+            if as_array:
+                return columnar_module.to_float_array(values)
             return values
         return None
 
+    @_instrumented
+    def query(self, query):
+        """
+        Run an `akips.query.Query` and parse the output.  mget queries return
+        {parent: {child: {attribute: value}}}, mgroup queries return
+        {parent: [groups]} and cseries queries return a list of row
+        dictionaries keyed by column header, as from get_series.
+        """
+        lines = self._iter_lines(params={'cmds': query.compile()})
+        if query.command == 'mget':
+            data = {}
+            for parent, child, attribute, value in parser.parse_mget(lines):
+                data.setdefault(parent, {}).setdefault(child, {})[attribute] = value
+        elif query.command == 'mgroup':
+            data = dict(parser.parse_mgroup(lines))
+        else:
+            data = list(csv.DictReader(lines))
+        logger.debug("Query {} found {} entries".format(query, len(data)))
+        return data
+
+    def iter_query(self, query):
+        """
+        Streaming variant of query.  Yields (parent, child, attribute, value)
+        for mget, (parent, groups) for mgroup and each CSV row as a list for
+        cseries (the header row first).
+        """
+        lines = self._iter_lines(params={'cmds': query.compile()})
+        if query.command == 'mget':
+            yield from parser.parse_mget(lines)
+        elif query.command == 'mgroup':
+            yield from parser.parse_mgroup(lines)
+        else:
+            yield from csv.reader(lines)
+
     # Base operations
 
     def _parse_enum(self, enum_string):
         """
         Attributes with a type of enum return five values separated by commas.
         """
-        match = re.match(r'^(\S*),(\S*),(\S*),(\S*),(\S*)$', enum_string)
-        if match:
+        fields = parser.split_enum(enum_string)
+        if fields:
             entry = {
-                'number': match.group(1),       # list number (from MIB)
-                'value': match.group(2),        # text value (from MIB)
-                # 'created': match.group(3),      # time created (epoch timestamp)
-                # 'modified': match.group(4),     # time modified (epoch timestamp)
-                'description': match.group(5)   # child description
+                'number': fields[0],        # list number (from MIB)
+                'value': fields[1],         # text value (from MIB)
+                # 'created': fields[2],       # time created (epoch timestamp)
+                # 'modified': fields[3],      # time modified (epoch timestamp)
+                'description': fields[4]    # child description
             }
-            entry['created'] = datetime.fromtimestamp(
-                int(match.group(3)), tz=pytz.timezone(self.server_timezone))
-            entry['modified'] = datetime.fromtimestamp(
-                int(match.group(4)), tz=pytz.timezone(self.server_timezone))
+            entry['created'] = datetime.fromtimestamp(int(fields[2]), tz=self.tzinfo)
+            entry['modified'] = datetime.fromtimestamp(int(fields[3]), tz=self.tzinfo)
             return entry
         else:
             raise AkipsError(message=f'Not a ENUM type value: {enum_string}')
 
-    def _get(self, section='/api-db/', params=None, timeout=30):
+    def _get(self, section='/api-db/', params=None, timeout=None, idempotent=None):
         """
         Call HTTP GET against the AKiPS server
         """
-        server_url = 'https://' + self.server + section
-        params['username'] = self.username
-        params['password'] = self.password
-
-        if 'cmds' in params:
-            logger.debug("akips command: {}".format(params['cmds']))
+        verb = command_verb(section, params)
+        start = time.perf_counter()
         try:
-            r = self.session.get(server_url, params=params, verify=self.verify, timeout=timeout)
-            r.raise_for_status()
-        except requests.exceptions.HTTPError as errh:
-            logger.error(errh)
-            raise
-        except requests.exceptions.ConnectionError as errc:
-            logger.error(errc)
-            raise
-        except requests.exceptions.Timeout as errt:
-            logger.error(errt)
-            raise
-        except requests.exceptions.RequestException as err:
-            logger.error(err)
+            r = self._request(section=section, params=params, timeout=timeout, idempotent=idempotent)
+            text = r.text
+        except Exception as err:
+            if self.observers:
+                self._record_request(RequestEvent(verb, section, time.perf_counter() - start,
+                                                  error=type(err).__name__))
             raise
+        if self.observers:
+            self._record_request(RequestEvent(
+                verb, section, time.perf_counter() - start, response_bytes=len(r.content),
+                lines=text.count('\n'), error='AkipsError' if parser.is_error(text) else None))
 
         # AKiPS can return a raw error message if something fails
-        if re.match(r'^ERROR:', r.text):
-            logger.error("Web API request failed: {}".format(r.text))
-            raise AkipsError(message=r.text)
+        if parser.is_error(text):
+            logger.error("Web API request failed: {}".format(text))
+            raise AkipsError(message=text)
         else:
-            logger.debug("akips output: {}".format(r.text))
-            return r.text
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("akips output: {}".format(self._truncate(text)))
+            return text
+
+    def _truncate(self, text):
+        """
+        Shorten a response body for debug logging.
+        """
+        if self.debug_body_limit is None or len(text) <= self.debug_body_limit:
+            return text
+        remaining = len(text) - self.debug_body_limit
+        return "{}... [{} more characters]".format(text[:self.debug_body_limit], remaining)
+
+    def _iter_lines(self, section='/api-db/', params=None, timeout=None, idempotent=None):
+        """
+        Call HTTP GET against the AKiPS server and yield the response one line at
+        a time as it arrives, without buffering the whole body.
+        """
+        verb = command_verb(section, params)
+        start = time.perf_counter()
+        response_bytes = 0
+        lines = 0
+        failure = None
+        try:
+            r = self._request(section=section, params=params, timeout=timeout, stream=True,
+                              idempotent=idempotent)
+            if r.encoding is None:
+                r.encoding = 'utf-8'
+            try:
+                first = True
+                for line in r.iter_lines(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True):
+                    if first:
+                        first = False
+                        # AKiPS can return a raw error message if something fails
+                        if parser.is_error(line):
+                            error = "\n".join([line] + list(r.iter_lines(chunk_size=STREAM_CHUNK_SIZE, decode_unicode=True)))
+                            logger.error("Web API request failed: {}".format(error))
+                            raise AkipsError(message=error)
+                    # decoded length plus the newline, exact for ASCII output
+                    response_bytes += len(line) + 1
+                    lines += 1
+                    yield line
+            finally:
+                r.close()
+        except Exception as err:
+            failure = type(err).__name__
+            raise
+        finally:
+            if self.observers:
+                self._record_request(RequestEvent(verb, section, time.perf_counter() - start,
+                                                  response_bytes=response_bytes, lines=lines,
+                                                  error=failure, streamed=True))
+
+    def _request(self, section='/api-db/', params=None, timeout=None, stream=False, idempotent=None):
+        """
+        Send the HTTP GET request and return the response object.  api-db
+        commands only read, so they are retried on transient failures.  Site
+        scripts are treated as writes unless idempotent is True.  A streamed
+        response is not retried once its headers have been received.
+        """
+        server_url = self.base_url + section
+        params['username'] = self.username
+        params['password'] = self.password
+        if timeout is None:
+            timeout = self.timeout
+        if idempotent is None:
+            idempotent = section == '/api-db/'
+        attempts = 1 + (self.retries if idempotent or self.retry_writes else 0)
+
+        if 'cmds' in params:
+            logger.debug("akips command: {}".format(params['cmds']))
+        for attempt in range(attempts):
+            try:
+                r = self.session.get(server_url, params=params, verify=self.verify, timeout=timeout,
+                                     stream=stream)
+                r.raise_for_status()
+                return r
+            except requests.exceptions.HTTPError as errh:
+                # Return a streamed response's connection to the pool, retried or not
+                r.close()
+                if attempt + 1 < attempts and errh.response is not None \
+                        and errh.response.status_code in RETRY_STATUS_CODES:
+                    self._backoff(attempt, errh)
+                    continue
+                logger.error(errh)
+                raise
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as errc:
+                if attempt + 1 < attempts:
+                    self._backoff(attempt, errc)
+                    continue
+                logger.error(errc)
+                raise
+            except requests.exceptions.RequestException as err:
+                logger.error(err)
+                raise
+
+    def _backoff(self, attempt, error):
+        """
+        Sleep before a retry, using exponential backoff with full jitter.
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_factor * (2 ** attempt)))
+        logger.warning("akips request failed ({}), retry {} of {} in {:.2f}s".format(
+            error, attempt + 1, self.retries, delay))
+        time.sleep(delay)
+
+
+def diff_status(old, new):
+    """
+    Compare two get_status results and return only the entries whose state
+    changed, keyed by (parent, child, attribute) with (old, new) EnumValue pairs.
+    Entries that appear or disappear have None on the missing side.
+    """
+    changes = {}
+    for key, entry in new.items():
+        previous = old.get(key)
+        if previous is None or previous.value != entry.value:
+            changes[key] = (previous, entry)
+    for key, previous in old.items():
+        if key not in new:
+            changes[key] = (previous, None)
+    return changes
+
+
+def _regex_escape(value):
+    """
+    Escape a literal value for use inside an AKiPS /regex/ argument.
+    """
+    return re.escape(value).replace('/', '\\/')
+
+
+def _regex_alternation(values):
+    """
+    Build an anchored AKiPS regex that matches any of the literal values exactly.
+    """
+    return '/^(' + '|'.join(_regex_escape(value) for value in values) + ')$/'
+
+
+def _encoded_length(value):
+    """
+    Length of a value once URL-encoded as a query parameter.
+    """
+    return len(quote(value, safe=''))
+
+
+def _chunk_by_size(values, max_length, size, overhead=0):
+    """
+    Split values into lists where overhead plus the size of each member stays
+    under max_length.  A value larger than max_length gets a list of its own.
+    """
+    chunk = []
+    length = overhead
+    for value in values:
+        value_size = size(value)
+        if chunk and length + value_size > max_length:
+            yield chunk
+            chunk = []
+            length = overhead
+        chunk.append(value)
+        length += value_size
+    if chunk:
+        yield chunk
+
+
+def _chunk_alternations(values, max_length):
+    """
+    Split values into lists whose alternation regex stays under max_length
+    characters once URL-encoded.
+    """
+    # each value adds its escaped text plus one '|' separator
+    return _chunk_by_size(values, max_length,
+                          lambda value: _encoded_length(_regex_escape(value) + '|'),
+                          overhead=_encoded_length(_regex_alternation([])))
@@ -0,0 +1,152 @@
+""" Asyncio interface to the AKiPS Web API.
+
+AsyncAKIPS mirrors the AKIPS method surface as coroutines.  Requests run on a
+bounded worker pool so many commands can be in flight at once, and results are
+produced by the same parsers used by AKIPS.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from akips import AKIPS
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class AsyncAKIPS:
+    """ Class to handle concurrent interactions with AKiPS API from asyncio code """
+
+    def __init__(self, server, username='api-ro', password=None,
+                 verify=True, timezone='America/New_York', max_concurrency=16, **kwargs):
+        """
+        Other keyword arguments (cache, observers, timeout, retries, ...) are
+        passed on to the underlying AKIPS client.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        # Keep one pooled connection per worker so fan-out does not churn connections
+        self.client = AKIPS(server, username=username, password=password,
+                            verify=verify, timezone=timezone,
+                            pool_maxsize=max(max_concurrency, kwargs.pop('pool_maxsize', 0)), **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix='akips')
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Release the worker pool and the underlying HTTP session.
+        """
+        self._executor.shutdown(wait=False)
+        self.client.session.close()
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking AKIPS call on the worker pool, bounded by the semaphore.
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def get_devices(self, group_filter='any', groups=[], use_cache=False, as_records=False):
+        """ Coroutine version of AKIPS.get_devices """
+        return await self._run(self.client.get_devices, group_filter=group_filter, groups=groups,
+                               use_cache=use_cache, as_records=as_records)
+
+    async def get_device(self, name, use_cache=False):
+        """ Coroutine version of AKIPS.get_device """
+        return await self._run(self.client.get_device, name, use_cache=use_cache)
+
+    async def get_devices_detail(self, names, attributes=None):
+        """ Coroutine version of AKIPS.get_devices_detail """
+        return await self._run(self.client.get_devices_detail, names, attributes=attributes)
+
+    async def get_device_by_ip(self, ipaddr, use_cache=True):
+        """ Coroutine version of AKIPS.get_device_by_ip """
+        return await self._run(self.client.get_device_by_ip, ipaddr, use_cache=use_cache)
+
+    async def get_ip_mapping(self):
+        """ Coroutine version of AKIPS.get_ip_mapping """
+        return await self._run(self.client.get_ip_mapping)
+
+    async def get_unreachable(self, as_records=False):
+        """ Coroutine version of AKIPS.get_unreachable """
+        return await self._run(self.client.get_unreachable, as_records=as_records)
+
+    async def get_group_membership(self, device='*', group_filter='any', groups=[], use_cache=False):
+        """ Coroutine version of AKIPS.get_group_membership """
+        return await self._run(self.client.get_group_membership, device=device,
+                               group_filter=group_filter, groups=groups, use_cache=use_cache)
+
+    async def set_group_membership(self, device, group, mode):
+        """ Coroutine version of AKIPS.set_group_membership """
+        return await self._run(self.client.set_group_membership, device, group, mode)
+
+    async def set_group_memberships(self, items):
+        """ Coroutine version of AKIPS.set_group_memberships """
+        return await self._run(self.client.set_group_memberships, items)
+
+    async def get_status(self, device='*', child='*', attribute='*', group_filter='any', groups=[],
+                         profile=None):
+        """ Coroutine version of AKIPS.get_status """
+        return await self._run(self.client.get_status, device=device, child=child, attribute=attribute,
+                               group_filter=group_filter, groups=groups, profile=profile)
+
+    async def get_events(self, event_type='all', period='last1h', as_records=False):
+        """ Coroutine version of AKIPS.get_events """
+        return await self._run(self.client.get_events, event_type=event_type, period=period,
+                               as_records=as_records)
+
+    async def get_series(self, period='last1h', device='*', attribute='*', get_dict=True,
+                         group_filter='any', groups=[], columnar=False):
+        """ Coroutine version of AKIPS.get_series """
+        return await self._run(self.client.get_series, period=period, device=device,
+                               attribute=attribute, get_dict=get_dict,
+                               group_filter=group_filter, groups=groups, columnar=columnar)
+
+    async def get_aggregate(self, period='last1h', device='*', attribute='*',
+                            operator='avg', interval='300', group_filter='any', groups=[],
+                            as_array=False):
+        """ Coroutine version of AKIPS.get_aggregate """
+        return await self._run(self.client.get_aggregate, period=period, device=device,
+                               attribute=attribute, operator=operator, interval=interval,
+                               group_filter=group_filter, groups=groups, as_array=as_array)
+
+    async def query(self, query):
+        """ Coroutine version of AKIPS.query """
+        return await self._run(self.client.query, query)
+
+    # Fan-out helpers
+
+    async def get_device_many(self, names):
+        """
+        Pull the configuration for many devices concurrently.  Returns a dictionary
+        keyed by device name.  At most max_concurrency requests are in flight.
+        """
+        names = list(names)
+        results = await asyncio.gather(*[self.get_device(name) for name in names])
+        logger.debug("Fetched {} devices concurrently".format(len(names)))
+        return dict(zip(names, results))
+
+    async def get_group_membership_many(self, devices):
+        """
+        Pull group memberships for many devices concurrently.  Returns a dictionary
+        keyed by device name.
+        """
+        devices = list(devices)
+        results = await asyncio.gather(*[self.get_group_membership(device=device)
+                                         for device in devices])
+        data = {}
+        for device, result in zip(devices, results):
+            data[device] = (result or {}).get(device)
+        return data
@@ -0,0 +1,135 @@
+""" Batched execution of AKIPS reader calls.
+
+A Batch queues calls to the AKIPS readers and runs them together when the
+batch is executed, either explicitly or on leaving a `with api.batch()` block.
+Each queued call returns a BatchResult placeholder that holds the parsed
+result once the batch has run.
+
+AKiPS output carries no marker showing where one command's output ends and
+the next begins, so combined commands could not be split back reliably.
+Each call is therefore still its own request, but all of them are in flight
+at once over the client's shared connection pool.  A page made of several
+calls then takes about as long as its slowest request instead of the sum.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from akips.exceptions import AkipsError
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+# AKIPS methods that may be queued on a batch
+BATCH_METHODS = (
+    'get_devices',
+    'get_device',
+    'get_devices_detail',
+    'get_device_by_ip',
+    'get_ip_mapping',
+    'get_unreachable',
+    'get_group_membership',
+    'get_status',
+    'get_events',
+    'get_series',
+    'get_aggregate',
+    'query',
+)
+
+
+class BatchResult:
+    """ Placeholder for the result of one queued call """
+    __slots__ = ('method', 'args', 'kwargs', '_done', '_value', '_error')
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self._done = False
+        self._value = None
+        self._error = None
+
+    @property
+    def done(self):
+        return self._done
+
+    def result(self):
+        """
+        Return the parsed result, re-raising the call's exception if it failed.
+        """
+        if not self._done:
+            raise AkipsError(message="batch has not been executed yet")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def exception(self):
+        """
+        Return the exception raised by the call, None if it succeeded.
+        """
+        if not self._done:
+            raise AkipsError(message="batch has not been executed yet")
+        return self._error
+
+    def __repr__(self):
+        state = 'done' if self._done else 'pending'
+        return "BatchResult({}, {})".format(self.method, state)
+
+
+class Batch:
+    """
+    Queue of AKIPS reader calls executed concurrently.
+
+    with api.batch() as batch:
+        device = batch.get_device('switch1')
+        groups = batch.get_group_membership(device='switch1')
+    print(device.result(), groups.result())
+    """
+
+    def __init__(self, api, max_workers=None):
+        self.api = api
+        self.max_workers = max_workers
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Nothing is sent when the block itself raised
+        if exc_type is None:
+            self.execute()
+
+    def __getattr__(self, name):
+        if name not in BATCH_METHODS:
+            raise AttributeError("{} cannot be batched".format(name))
+
+        def queue(*args, **kwargs):
+            call = BatchResult(name, args, kwargs)
+            self.calls.append(call)
+            return call
+        return queue
+
+    def __len__(self):
+        return len(self.calls)
+
+    def _run(self, call):
+        try:
+            call._value = getattr(self.api, call.method)(*call.args, **call.kwargs)
+        except Exception as error:   # pylint: disable=broad-except
+            call._error = error
+        call._done = True
+
+    def execute(self):
+        """
+        Run every pending call and return the list of BatchResults in queue
+        order.  A failing call does not stop the others, its exception is
+        raised by its result() method.
+        """
+        pending = [call for call in self.calls if not call.done]
+        if len(pending) == 1:
+            self._run(pending[0])
+        elif pending:
+            max_workers = min(len(pending), self.max_workers or self.api.pool_maxsize)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='akips-batch') as pool:
+                list(pool.map(self._run, pending))
+        logger.debug("Batch ran {} calls".format(len(pending)))
+        return list(self.calls)
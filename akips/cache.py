@@ -0,0 +1,151 @@
+""" Result caching for AKiPS API calls.
+
+AkipsCache keeps one TTLCache per API method so each method can have its own
+time to live and size bound.  Cached results are shared objects; callers
+should copy them before making changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Default time to live, in seconds, for each cacheable method
+DEFAULT_TTLS = {
+    'get_device_by_ip': 3600,
+    'get_device': 300,
+    'get_devices': 300,
+    'get_group_membership': 300,
+}
+
+
+class TTLCache:
+    """ Least recently used cache whose entries expire after ttl seconds """
+
+    def __init__(self, ttl, maxsize=1024, timer=time.monotonic):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Look up a key.  Returns a (hit, value) tuple, value is None on a miss.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > self.timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+        """
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None, predicate=None):
+        """
+        Remove one key, every key matching predicate, or (with no arguments)
+        everything.  Returns the number of entries removed.
+        """
+        with self._lock:
+            if key is not None:
+                return 1 if self._data.pop(key, None) is not None else 0
+            if predicate is None:
+                count = len(self._data)
+                self._data.clear()
+                return count
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def stats(self):
+        """
+        Return hit, miss and eviction counters along with the current size.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+        }
+
+
+class AkipsCache:
+    """ Per-method TTL caches used by the AKIPS class """
+
+    def __init__(self, ttls=None, maxsize=1024, timer=time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.maxsize = maxsize
+        self.timer = timer
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def _cache(self, method):
+        with self._lock:
+            if method not in self._caches:
+                self._caches[method] = TTLCache(self.ttls.get(method, 0), maxsize=self.maxsize,
+                                                timer=self.timer)
+            return self._caches[method]
+
+    def get(self, method, key):
+        """
+        Look up a cached result.  Returns a (hit, value) tuple.  Methods with a
+        ttl of zero or less are never cached.
+        """
+        if self.ttls.get(method, 0) <= 0:
+            return False, None
+        return self._cache(method).get(key)
+
+    def set(self, method, key, value):
+        """
+        Cache a result for a method call.
+        """
+        if self.ttls.get(method, 0) <= 0:
+            return
+        self._cache(method).set(key, value)
+
+    def invalidate(self, method=None, key=None, predicate=None):
+        """
+        Drop cached entries.  With no method every cache is cleared.  Returns the
+        number of entries removed.
+        """
+        if method is None:
+            with self._lock:
+                caches = list(self._caches.values())
+            return sum(cache.invalidate() for cache in caches)
+        with self._lock:
+            cache = self._caches.get(method)
+        if cache is None:
+            return 0
+        return cache.invalidate(key=key, predicate=predicate)
+
+    def stats(self):
+        """
+        Return per-method cache counters.
+        """
+        with self._lock:
+            caches = dict(self._caches)
+        return {method: cache.stats() for method, cache in caches.items()}
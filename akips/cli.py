@@ -0,0 +1,255 @@
+""" Command line bulk exporter for the AKiPS Web API.
+
+Records are streamed to stdout or a file as NDJSON or CSV as they arrive, and
+a throughput summary is printed to stderr.  Long series exports are split into
+shards that run on parallel workers.  With --checkpoint, each shard is recorded
+with the output size once its rows are written.  Rerunning an interrupted
+export cuts the output back to the last recorded shard and continues from there.
+
+    akips devices --server akips.example.com --format csv --output devices.csv
+    akips series --attribute IF-MIB.ifHCInOctets --start 1708473600 --end 1711065600 \\
+        --window 86400 --workers 8 --output octets.ndjson --checkpoint octets.ckpt
+
+The password is read from the AKIPS_PASSWORD environment variable when
+--password is not given, and the server from AKIPS_SERVER.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import requests
+
+from akips import AKIPS, DEVICE_ATTRIBUTES
+from akips.exceptions import AkipsError
+from akips.export import FORMATS, SERIES_FIELDS, iter_shard_results, long_rows, series_shards, time_windows
+from akips.export import write_records
+from akips.metrics import MetricsCollector
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+def _devices(api, args):
+    for name, attributes in api.iter_devices(group_filter=args.group_filter, groups=args.group):
+        yield {'name': name, **attributes}
+
+
+def _groups(api, args):
+    for name, groups in api.iter_group_membership(device=args.device, group_filter=args.group_filter,
+                                                  groups=args.group):
+        yield {'device': name, 'groups': groups}
+
+
+def _unreachable(api, args):
+    yield from api.get_unreachable().values()
+
+
+def _events(api, args):
+    yield from api.iter_events(event_type=args.type, period=args.period)
+
+
+def _shard_key(shard):
+    return json.dumps(shard, sort_keys=True)
+
+
+def read_checkpoint(path):
+    """
+    Return the set of shard keys already exported and the output size in
+    bytes after the last of them, (set(), 0) when path does not exist.
+
+    Each checkpoint line holds the output offset and the shard key.
+    """
+    done = set()
+    offset = 0
+    if not path or not os.path.exists(path):
+        return done, offset
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            position, key = line.split(' ', 1)
+            done.add(key)
+            offset = max(offset, int(position))
+    return done, offset
+
+
+def _prepare_resume(path, done, offset):
+    """
+    Cut the output back to the end of the last checkpointed shard, dropping
+    partial rows of an interrupted shard.  Returns True when resuming.
+    """
+    if not done:
+        return False
+    if not os.path.exists(path):
+        raise AkipsError(message=f"checkpoint lists finished shards but {path} does not exist")
+    if os.path.getsize(path) < offset:
+        raise AkipsError(message=f"{path} is shorter than the checkpoint, it was truncated or replaced")
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+    return True
+
+
+def _series(api, args, output, done):
+    """
+    Yield long layout series rows for every shard not in done.  Once all rows
+    of a shard have been consumed, and so written, the output is flushed and
+    the shard is added to the checkpoint file with the output offset.
+    """
+    windows = None
+    if args.start is not None or args.end is not None:
+        if args.start is None or args.end is None:
+            raise ValueError("--start and --end must be given together")
+        windows = time_windows(args.start, args.end, args.window or (args.end - args.start))
+    shards = series_shards(period=args.period, device=args.device, attribute=args.attribute,
+                           groups=args.shard_group, devices=args.shard_device, windows=windows)
+    pending = [shard for shard in shards if _shard_key(shard) not in done]
+    if len(pending) < len(shards):
+        logger.info("Skipping {} shards found in the checkpoint".format(len(shards) - len(pending)))
+    checkpoint = open(args.checkpoint, 'a', encoding='utf-8') if args.checkpoint else None
+    try:
+        for shard, rows in iter_shard_results(api, pending, max_workers=args.workers):
+            yield from long_rows(rows)
+            if checkpoint:
+                output.flush()
+                checkpoint.write(f'{output.tell()} {_shard_key(shard)}\n')
+                checkpoint.flush()
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+
+# Subcommand: (record generator, CSV columns or None to use the first record's keys)
+EXPORTS = {
+    'devices': (_devices, ['name'] + DEVICE_ATTRIBUTES),
+    'groups': (_groups, ['device', 'groups']),
+    'unreachable': (_unreachable, None),
+    'events': (_events, None),
+    'series': (_series, SERIES_FIELDS),
+}
+
+
+def _csv_record(record):
+    """ Join list values, such as group names, with commas for CSV output """
+    return {key: ','.join(value) if isinstance(value, list) else value for key, value in record.items()}
+
+
+def build_parser():
+    """
+    Return the argparse parser for the akips command.
+    """
+    # Options shared by every subcommand, given after the subcommand name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--server', default=os.environ.get('AKIPS_SERVER'),
+                        help="AKiPS server name or URL (default $AKIPS_SERVER)")
+    common.add_argument('--username', default=os.environ.get('AKIPS_USERNAME', 'api-ro'))
+    common.add_argument('--password', default=os.environ.get('AKIPS_PASSWORD'),
+                        help="API password (default $AKIPS_PASSWORD)")
+    common.add_argument('--no-verify', dest='verify', action='store_false',
+                        help="do not verify the server's TLS certificate")
+    common.add_argument('--timezone', default='America/New_York', help="AKiPS server timezone")
+    common.add_argument('--timeout', type=float, default=30, help="request timeout in seconds")
+    common.add_argument('--format', choices=FORMATS, default='ndjson')
+    common.add_argument('--output', '-o', help="output file (default stdout)")
+    common.add_argument('--workers', type=int, default=4, help="parallel requests for series shards")
+    common.add_argument('--quiet', '-q', action='store_true', help="do not print the summary")
+    common.add_argument('--debug', action='store_true', help="enable debug logging")
+
+    arg_parser = argparse.ArgumentParser(prog='akips', description=__doc__.splitlines()[0])
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    devices = commands.add_parser('devices', parents=[common], help="key attributes of each device")
+    groups = commands.add_parser('groups', parents=[common], help="group membership of each device")
+    groups.add_argument('--device', default='*', help="device name or /regex/")
+    for command in (devices, groups):
+        command.add_argument('--group', action='append', default=[], help="filter by group (repeatable)")
+        command.add_argument('--group-filter', choices=('any', 'all', 'not'), default='any')
+
+    commands.add_parser('unreachable', parents=[common], help="devices with a down ping or SNMP state")
+
+    events = commands.add_parser('events', parents=[common], help="event log entries")
+    events.add_argument('--type', default='all', help="event type (default all)")
+    events.add_argument('--period', default='last1h', help="time filter (default last1h)")
+
+    series = commands.add_parser('series', parents=[common], help="counter time series, one value per record")
+    series.add_argument('--period', default='last1h', help="time filter when not using --start/--end")
+    series.add_argument('--device', default='*', help="device name or /regex/")
+    series.add_argument('--attribute', default='*', help="attribute name or /regex/")
+    series.add_argument('--shard-group', action='append', help="one shard per group (repeatable)")
+    series.add_argument('--shard-device', action='append', help="one shard per device /regex/ (repeatable)")
+    series.add_argument('--start', type=int, help="start epoch of the export")
+    series.add_argument('--end', type=int, help="end epoch of the export")
+    series.add_argument('--window', type=int, help="seconds per time window shard")
+    series.add_argument('--checkpoint', help="file recording finished shards, to resume an export")
+    return arg_parser
+
+
+def main(argv=None):
+    """
+    Run the akips command, returns the process exit code.
+    """
+    arg_parser = build_parser()
+    args = arg_parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+    if not args.server:
+        arg_parser.error("--server or AKIPS_SERVER is required")
+    if args.workers < 1:
+        arg_parser.error("--workers must be at least 1")
+    checkpoint = getattr(args, 'checkpoint', None)
+    if checkpoint and not args.output:
+        arg_parser.error("--checkpoint requires --output")
+
+    collector = MetricsCollector()
+    api = AKIPS(args.server, username=args.username, password=args.password, verify=args.verify,
+                timezone=args.timezone, timeout=args.timeout, observers=[collector],
+                pool_maxsize=max(args.workers, 10))
+    done, offset = read_checkpoint(checkpoint)
+    generator, fieldnames = EXPORTS[args.command]
+
+    start = time.perf_counter()
+    try:
+        # Resume by appending to the earlier output, without a second CSV header
+        resume = _prepare_resume(args.output, done, offset)
+    except AkipsError as err:
+        print(f"akips {args.command}: {err}", file=sys.stderr)
+        return 1
+    output = open(args.output, 'a' if resume else 'w', newline='', encoding='utf-8') if args.output \
+        else sys.stdout
+    try:
+        if args.command == 'series':
+            records = generator(api, args, output, done)
+        else:
+            records = generator(api, args)
+        if args.format == 'csv':
+            records = (_csv_record(record) for record in records)
+        count = write_records(records, output, fmt=args.format, fieldnames=fieldnames, header=not (resume and offset))
+    except (AkipsError, ValueError, requests.exceptions.RequestException) as err:
+        print(f"akips {args.command}: {err}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # stdout was closed early, e.g. piped to head
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+        api.session.close()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        stats = collector.snapshot().values()
+        requests_made = sum(verb['requests'] for verb in stats)
+        received = sum(verb['response_bytes'] for verb in stats)
+        rate = count / elapsed if elapsed else 0.0
+        print(f"akips {args.command}: {count} records in {elapsed:.2f}s ({rate:.0f} records/s), "
+              f"{requests_made} requests, {received / 1e6:.1f} MB received", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
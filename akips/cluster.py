@@ -0,0 +1,186 @@
+""" Queries across several AKiPS servers.
+
+AKIPSCluster wraps one AKIPS client per server and runs each call against
+every server in parallel.  The results are merged with the name of the server
+they came from.  A server that fails or misses the deadline is reported in
+ClusterResult.errors, and the results from the other servers are still
+returned.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from akips import AKIPS
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class ClusterTimeout(Exception):
+    """ Raised in ClusterResult.errors for a server that missed the deadline """
+
+
+class ClusterResult:
+    """ Merged data from the servers that answered, and the errors of those that did not """
+    __slots__ = ('data', 'errors', 'servers')
+
+    def __init__(self, data, errors, servers):
+        self.data = data
+        self.errors = errors        # {server: exception}
+        self.servers = servers      # servers that answered
+
+    @property
+    def partial(self):
+        """ True when at least one server failed or timed out """
+        return bool(self.errors)
+
+    def __repr__(self):
+        return "ClusterResult(servers={!r}, errors={!r})".format(self.servers, list(self.errors))
+
+
+class AKIPSCluster:
+    """
+    Class to run AKiPS API calls against several servers at once
+
+    cluster = AKIPSCluster(['akips-east.example.com', 'akips-west.example.com'],
+                           password='something', timeout=10)
+    result = cluster.get_unreachable()
+    """
+
+    def __init__(self, servers, timeout=None, request_timeout=None, **kwargs):
+        """
+        servers is a list of server names or AKIPS clients.  Other keyword
+        arguments (username, password, verify, retries, ...) are used to create
+        a client for each server name.
+
+        timeout is the number of seconds to wait for all servers on each call,
+        None waits for every server.  It bounds how long the caller waits.
+        request_timeout is passed to each created client as its HTTP request
+        timeout (one number or a (connect, read) tuple).
+
+        Each server has its own worker, so a hung server never delays another.
+        While a server is still busy with an earlier call that missed the
+        deadline, later calls report it as timed out without queueing more work.
+        """
+        if request_timeout is not None:
+            kwargs['timeout'] = request_timeout
+        self.clients = {}
+        for server in servers:
+            client = server if isinstance(server, AKIPS) else AKIPS(server, **kwargs)
+            self.clients[client.server] = client
+        if not self.clients:
+            raise ValueError("at least one server is required")
+        self.timeout = timeout
+        self._executors = {server: ThreadPoolExecutor(max_workers=1, thread_name_prefix='akips-cluster')
+                           for server in self.clients}
+        self._running = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """
+        Release the workers and every client's HTTP session.
+        """
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
+        for client in self.clients.values():
+            client.session.close()
+
+    def call(self, method, *args, **kwargs):
+        """
+        Run an AKIPS method on every server.  Returns a ClusterResult whose
+        data maps each server that answered to its result.
+        """
+        futures = {}
+        errors = {}
+        for server, client in self.clients.items():
+            previous = self._running.get(server)
+            if previous is not None and not previous.done():
+                errors[server] = ClusterTimeout("{} is still busy with an earlier call".format(server))
+                continue
+            futures[server] = self._running[server] = self._executors[server].submit(
+                getattr(client, method), *args, **kwargs)
+        wait(futures.values(), timeout=self.timeout)
+        data = {}
+        for server, future in futures.items():
+            if not future.done():
+                # The request keeps running in the background, its result is dropped
+                errors[server] = ClusterTimeout("{} did not answer within {}s".format(server, self.timeout))
+            elif future.exception() is not None:
+                errors[server] = future.exception()
+            else:
+                data[server] = future.result()
+        for server, error in errors.items():
+            logger.warning("akips cluster {} failed on {}: {}".format(method, server, error))
+        return ClusterResult(data, errors, list(data))
+
+    def _merge_by_name(self, result):
+        """
+        Merge {name: dict} results from each server, adding a 'server' key.
+        A name found on more than one server keeps the first server's entry.
+        """
+        merged = {}
+        for server, entries in result.data.items():
+            for name, entry in (entries or {}).items():
+                if name in merged:
+                    logger.debug("{} found on {} and {}".format(name, merged[name]['server'], server))
+                    continue
+                merged[name] = dict(entry, server=server)
+        result.data = merged
+        return result
+
+    def get_devices(self, group_filter='any', groups=[], use_cache=False):
+        """
+        Pull the key attributes of all devices on every server, see
+        AKIPS.get_devices.  Each device also has a 'server' key.
+        """
+        return self._merge_by_name(self.call('get_devices', group_filter=group_filter, groups=groups,
+                                             use_cache=use_cache))
+
+    def get_device(self, name, use_cache=False):
+        """
+        Look a device up on every server, see AKIPS.get_device.  Data is the
+        first match in server order with a 'server' key, or None.
+        """
+        result = self.call('get_device', name, use_cache=use_cache)
+        device = None
+        for server, found in result.data.items():
+            if found:
+                device = dict(found, server=server)
+                break
+        result.data = device
+        return result
+
+    def get_unreachable(self):
+        """
+        Pull the unreachable devices of every server, see AKIPS.get_unreachable.
+        Each device also has a 'server' key.
+        """
+        return self._merge_by_name(self.call('get_unreachable'))
+
+    def get_group_membership(self, device='*', group_filter='any', groups=[], use_cache=False):
+        """
+        Pull group membership from every server, see AKIPS.get_group_membership.
+        Data maps each device name to {'server': server, 'groups': [...]}.
+        """
+        result = self.call('get_group_membership', device=device, group_filter=group_filter,
+                           groups=groups, use_cache=use_cache)
+        result.data = {server: {name: {'groups': member_of} for name, member_of in (entries or {}).items()}
+                       for server, entries in result.data.items()}
+        return self._merge_by_name(result)
+
+    def get_events(self, event_type='all', period='last1h'):
+        """
+        Pull events from every server, see AKIPS.get_events.  Data is one list
+        sorted by epoch, each event with a 'server' key.
+        """
+        result = self.call('get_events', event_type=event_type, period=period)
+        events = []
+        for server, server_events in result.data.items():
+            events.extend(dict(event, server=server) for event in (server_events or []))
+        events.sort(key=lambda event: int(event['epoch']))
+        result.data = events
+        return result
@@ -0,0 +1,92 @@
+""" Columnar (NumPy) representations of AKiPS time-series output.
+
+NumPy is an optional dependency and is only needed when columnar output is
+requested.
+"""
+import csv
+
+from akips.exceptions import AkipsError
+
+try:
+    import numpy as np
+except ImportError:     # pragma: no cover
+    np = None
+
+# Leading cseries columns that describe each row rather than hold values
+SERIES_KEY_COLUMNS = ['parent', 'child', 'child description', 'attribute']
+
+
+def require_numpy():
+    """
+    Raise a helpful error when NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("numpy is required for columnar output and rollups, install it with 'pip install akips[numpy]'")
+
+
+def to_float_array(values):
+    """
+    Convert a sequence of numeric strings to a float64 array.  Blank values
+    become NaN.
+    """
+    try:
+        return np.array(values, dtype=np.float64)
+    except ValueError:
+        return np.array([float(value) if value else np.nan for value in values], dtype=np.float64)
+
+
+class SeriesTable:
+    """
+    Column oriented cseries result.  Row i of values holds the series for
+    parents[i], children[i], attributes[i] across the shared timestamps index.
+    Timestamps are naive datetime64 values in the server's timezone.
+    """
+    __slots__ = ('timestamps', 'parents', 'children', 'descriptions', 'attributes', 'values')
+
+    def __init__(self, timestamps, parents, children, descriptions, attributes, values):
+        self.timestamps = timestamps
+        self.parents = parents
+        self.children = children
+        self.descriptions = descriptions
+        self.attributes = attributes
+        self.values = values
+
+    def __len__(self):
+        return len(self.parents)
+
+    def __repr__(self):
+        return "SeriesTable(rows={}, timestamps={})".format(len(self.parents), len(self.timestamps))
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Build a table from cseries CSV output lines.  Rows are converted as they
+        are read, so lines may be a streamed response.
+        """
+        require_numpy()
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if not header:
+            return None
+        if header[:len(SERIES_KEY_COLUMNS)] != SERIES_KEY_COLUMNS:
+            raise AkipsError(message=f'Unexpected cseries header: {header[:len(SERIES_KEY_COLUMNS)]}')
+        width = len(header) - len(SERIES_KEY_COLUMNS)
+        timestamps = np.array(header[len(SERIES_KEY_COLUMNS):], dtype='datetime64[m]')
+
+        parents, children, descriptions, attributes, rows = [], [], [], [], []
+        for row in reader:
+            if not row:
+                continue
+            parents.append(row[0])
+            children.append(row[1])
+            descriptions.append(row[2])
+            attributes.append(row[3])
+            values = row[len(SERIES_KEY_COLUMNS):]
+            if len(values) != width:
+                raise AkipsError(message=f'cseries row for {row[0]} {row[1]} has {len(values)} values, '
+                                         f'expected {width}')
+            rows.append(to_float_array(values))
+
+        values = np.vstack(rows) if rows else np.empty((0, width), dtype=np.float64)
+        return cls(timestamps, np.array(parents, dtype=object), np.array(children, dtype=object),
+                   np.array(descriptions, dtype=object), np.array(attributes, dtype=object), values)
@@ -0,0 +1,263 @@
+""" Sharded, parallel export of AKiPS time-series data.
+
+A large cseries request is split into shards by device group, device regex
+and/or time window.  Shards run on a thread pool with bounded concurrency,
+and their rows are yielded in shard order in a long (one value per row)
+layout that can be streamed straight to CSV or NDJSON files.
+
+Rows of the shard at the head of the order are passed on as they arrive.
+Shards further ahead are spooled to temporary files until their turn, so
+memory use does not grow with the shard size.
+"""
+import collections
+import csv
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+# Columns of the long series layout produced by iter_series_rows
+SERIES_FIELDS = ['parent', 'child', 'description', 'attribute', 'time', 'value']
+
+# Output formats supported by write_records
+FORMATS = ('csv', 'ndjson')
+
+# Bytes of spooled rows a shard keeps in memory before moving them to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Rows received but not yet consumed for the head shard, the worker waits beyond this
+STREAM_QUEUE_ROWS = 1000
+
+
+def time_windows(start, end, step):
+    """
+    Split the epoch range [start, end) into AKiPS time filters of at most step
+    seconds each, e.g. 'from 1708473600 to 1708477200'.
+    """
+    if step <= 0:
+        raise ValueError("step must be a positive number of seconds")
+    windows = []
+    while start < end:
+        stop = min(start + step, end)
+        windows.append(f'from {start} to {stop}')
+        start = stop
+    return windows
+
+
+def series_shards(period='last1h', device='*', attribute='*', groups=None, devices=None, windows=None):
+    """
+    Build the list of get_series keyword arguments for each shard.
+
+    groups gives one shard per group name and devices gives one shard per
+    device regex (use one or the other).  windows gives one shard per time
+    filter and replaces period.  Groups and devices are combined with every
+    window.  A device in several of the listed groups is exported once per group.
+    """
+    if groups and devices:
+        raise ValueError("shard by groups or by devices, not both")
+    targets = [{'device': device}]
+    if groups:
+        targets = [{'device': device, 'group_filter': 'any', 'groups': [group]} for group in groups]
+    elif devices:
+        targets = [{'device': pattern} for pattern in devices]
+    periods = windows or [period]
+    return [dict(target, period=window, attribute=attribute) for target in targets for window in periods]
+
+
+class _Cancelled(Exception):
+    """ Raised in a shard worker when the consumer has gone away """
+
+
+class _ShardStream:
+    """
+    Rows of one shard, handed from its worker thread to the consumer.
+
+    Until the consumer reaches the shard, rows are written to a spooled
+    temporary file.  Once it does, they are passed through a bounded queue.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, mode='w+', newline='',
+                                                    encoding='utf-8')
+        self._writer = csv.writer(self._spool)
+        self._queue = collections.deque()
+        self._streaming = False
+        self._cancelled = False
+        self._done = False
+        self._error = None
+
+    def put(self, row):
+        """ Add a row, called by the worker """
+        with self._cond:
+            if not self._streaming:
+                self._writer.writerow(row)
+                return
+            while len(self._queue) >= STREAM_QUEUE_ROWS and not self._cancelled:
+                self._cond.wait()
+            if self._cancelled:
+                raise _Cancelled()
+            self._queue.append(row)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        """ Mark the shard complete, called by the worker """
+        with self._cond:
+            self._done = True
+            self._error = error
+            self._cond.notify_all()
+
+    def cancel(self):
+        """ Stop the worker at its next row and drop the spooled rows """
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+            if not self._streaming:
+                self._streaming = True
+                self._spool.close()
+
+    def rows(self):
+        """
+        Yield the shard's rows, the spooled ones first, then the rest as the
+        worker receives them.  Raises the worker's error after its last row.
+        """
+        with self._cond:
+            # From here on the worker only appends to the queue, the spool is ours
+            self._streaming = True
+        try:
+            self._spool.seek(0)
+            yield from csv.reader(self._spool)
+        finally:
+            self._spool.close()
+        while True:
+            with self._cond:
+                while not self._queue and not self._done:
+                    self._cond.wait()
+                batch = list(self._queue)
+                self._queue.clear()
+                self._cond.notify_all()
+            if batch:
+                yield from batch
+            elif self._error is not None:
+                raise self._error
+            else:
+                return
+
+
+def _fetch_shard(api, shard, stream):
+    """
+    Run one shard, passing its rows (lists, header first) to stream.
+    """
+    try:
+        for row in api.iter_series(get_dict=False, **shard):
+            stream.put(row)
+    except _Cancelled:
+        return
+    except Exception as err:
+        stream.finish(err)
+    else:
+        stream.finish()
+
+
+def iter_shard_results(api, shards, max_workers=4):
+    """
+    Run the shards on a pool of max_workers threads and yield (shard, rows)
+    in shard order, rows being an iterator of the shard's cseries rows as
+    lists with the header first.  Consume rows before moving to the next
+    shard, rows left over are dropped.  At most max_workers shards run at a
+    time, and only the rows of the shard being consumed are held in memory.
+    """
+    shards = list(shards)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='akips-export') as pool:
+        pending = collections.deque()
+        next_shard = 0
+        try:
+            while next_shard < len(shards) or pending:
+                while next_shard < len(shards) and len(pending) < max_workers:
+                    stream = _ShardStream()
+                    pool.submit(_fetch_shard, api, shards[next_shard], stream)
+                    pending.append((shards[next_shard], stream))
+                    next_shard += 1
+                shard, stream = pending[0]
+                rows = stream.rows()
+                try:
+                    yield shard, rows
+                finally:
+                    rows.close()
+                    stream.cancel()
+                pending.popleft()
+        finally:
+            # Release workers still running when the caller stops early
+            for _, stream in pending:
+                stream.cancel()
+
+
+def long_rows(rows):
+    """
+    Convert cseries rows (lists, header first) to long layout dictionaries,
+    see SERIES_FIELDS.
+    """
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        return
+    times = header[4:]
+    for row in rows:
+        if len(row) < 4:
+            continue
+        for timestamp, value in zip(times, row[4:]):
+            yield {
+                'parent': row[0],
+                'child': row[1],
+                'description': row[2],
+                'attribute': row[3],
+                'time': timestamp,
+                'value': value,
+            }
+
+
+def iter_series_rows(api, shards, max_workers=4):
+    """
+    Run the shards on a pool of max_workers threads and yield long layout
+    dictionaries (see SERIES_FIELDS) in shard order.  Rows are streamed, see
+    iter_shard_results.
+    """
+    for _, rows in iter_shard_results(api, shards, max_workers=max_workers):
+        yield from long_rows(rows)
+
+
+def write_records(records, fileobj, fmt='csv', fieldnames=None, header=True):
+    """
+    Stream records (dictionaries) to an open text file as CSV or NDJSON.
+    Set header=False to leave out the CSV header, e.g. when appending.
+    Returns the number of records written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    count = 0
+    writer = None
+    for record in records:
+        if fmt == 'ndjson':
+            fileobj.write(json.dumps(record, default=str) + '\n')
+        else:
+            if writer is None:
+                writer = csv.DictWriter(fileobj, fieldnames=fieldnames or list(record), extrasaction='ignore')
+                if header:
+                    writer.writeheader()
+            writer.writerow(record)
+        count += 1
+    return count
+
+
+def export_series(api, shards, fileobj, fmt='csv', max_workers=4):
+    """
+    Export shards to an open text file.  Returns the number of values written.
+    """
+    count = write_records(iter_series_rows(api, shards, max_workers=max_workers), fileobj,
+                          fmt=fmt, fieldnames=SERIES_FIELDS)
+    logger.debug("Exported {} series values".format(count))
+    return count
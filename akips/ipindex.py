@@ -0,0 +1,123 @@
+""" Local reverse IP index for AKiPS devices.
+
+IPIndex holds the full address to device mapping from AKIPS.get_ip_mapping in
+memory, so looking up an address is a dictionary access instead of a site
+script call that scans ip2name.cfg on the server.  Addresses are also kept in
+sorted order, so every device address inside a subnet can be found with two
+binary searches.
+
+A stale index is rebuilt by the first lookup that notices it.  Other lookups
+meanwhile keep answering from the current copy instead of waiting or starting
+their own export.  If a rebuild fails, the current copy keeps being served and
+the rebuild is retried after retry_interval seconds.
+"""
+import bisect
+import ipaddress
+import logging
+import threading
+import time
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+class IPIndex:
+    """ Class to answer IP address to device lookups from a local copy """
+
+    def __init__(self, api, refresh_interval=3600, retry_interval=60, clock=time.monotonic):
+        self.api = api
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.refreshed = None
+        self._retry_at = None
+        self._mapping = {}
+        self._sorted = {4: ([], []), 6: ([], [])}
+        self._lock = threading.Lock()
+        # held while an export is running, so only one runs at a time
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._mapping)
+
+    def refresh(self):
+        """
+        Pull the current mapping from AKiPS and rebuild the index.  Lookups keep
+        using the previous index until the new one is complete.
+        """
+        with self._refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        mapping = {}
+        addresses = {4: [], 6: []}
+        for address, device in self.api.get_ip_mapping().items():
+            try:
+                ip = ipaddress.ip_address(address)
+            except ValueError:
+                logger.debug("Skipping invalid address {} for {}".format(address, device))
+                continue
+            mapping[str(ip)] = device
+            addresses[ip.version].append((int(ip), str(ip)))
+
+        sorted_addresses = {}
+        for version, entries in addresses.items():
+            entries.sort()
+            sorted_addresses[version] = ([key for key, _ in entries], [address for _, address in entries])
+
+        with self._lock:
+            self._mapping = mapping
+            self._sorted = sorted_addresses
+            self.refreshed = self.clock()
+            self._retry_at = None
+        logger.debug("Indexed {} IP addresses".format(len(mapping)))
+
+    def _stale(self):
+        now = self.clock()
+        if now - self.refreshed < self.refresh_interval:
+            return False
+        return self._retry_at is None or now >= self._retry_at
+
+    def _refresh_if_stale(self):
+        if self.refreshed is None:
+            # Nothing to serve yet, so wait for the first load
+            with self._refresh_lock:
+                if self.refreshed is None:
+                    self._rebuild()
+            return
+        if not self._stale() or not self._refresh_lock.acquire(blocking=False):
+            # Fresh, or another caller is already rebuilding
+            return
+        try:
+            if self._stale():
+                self._rebuild()
+        except Exception as err:   # pylint: disable=broad-except
+            self._retry_at = self.clock() + self.retry_interval
+            logger.warning("IP index refresh failed, serving the previous copy: {}".format(err))
+        finally:
+            self._refresh_lock.release()
+
+    def lookup(self, address):
+        """
+        Return the device name an IP address is configured on, or None.
+        """
+        self._refresh_if_stale()
+        try:
+            address = str(ipaddress.ip_address(address))
+        except ValueError:
+            return None
+        return self._mapping.get(address)
+
+    def lookup_subnet(self, network):
+        """
+        Return a dictionary of every known address inside a network (CIDR string
+        or ipaddress network) and the device it is configured on, in address order.
+        """
+        self._refresh_if_stale()
+        network = ipaddress.ip_network(network, strict=False)
+        with self._lock:
+            keys, addresses = self._sorted[network.version]
+            mapping = self._mapping
+        start = bisect.bisect_left(keys, int(network.network_address))
+        end = bisect.bisect_right(keys, int(network.broadcast_address))
+        return {address: mapping[address] for address in addresses[start:end]}
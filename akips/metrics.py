@@ -0,0 +1,162 @@
+""" Request instrumentation for the AKIPS client.
+
+Observers registered on an AKIPS instance are told about every HTTP request
+(command verb, latency, response size, line count, error) and about the
+parsing done by each public reader (lines and time spent outside of HTTP).
+MetricsCollector is an observer that keeps Prometheus style counters.
+"""
+import threading
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def command_verb(section, params):
+    """
+    Return the verb used to label a request: the first word of an api-db
+    command (mget, mgroup, cseries, aggregate) or the api-script function name.
+    """
+    if params:
+        if params.get('cmds'):
+            return params['cmds'].split(None, 1)[0]
+        if params.get('function'):
+            return params['function']
+    return section.strip('/') or 'unknown'
+
+
+class RequestEvent:
+    """ One HTTP request sent to AKiPS """
+    __slots__ = ('verb', 'section', 'seconds', 'response_bytes', 'lines', 'error', 'streamed')
+
+    def __init__(self, verb, section, seconds, response_bytes=0, lines=0, error=None, streamed=False):
+        self.verb = verb
+        self.section = section
+        self.seconds = seconds              # time until the whole body was received
+        self.response_bytes = response_bytes
+        self.lines = lines
+        self.error = error                  # exception class name, None on success
+        self.streamed = streamed            # streamed seconds include the consumer's time
+
+    def __repr__(self):
+        return ("RequestEvent(verb={!r}, seconds={:.4f}, response_bytes={}, lines={}, error={!r})"
+                .format(self.verb, self.seconds, self.response_bytes, self.lines, self.error))
+
+
+class ParseEvent:
+    """ Parsing work done by one public reader call """
+    __slots__ = ('method', 'verb', 'lines', 'seconds')
+
+    def __init__(self, method, verb, lines, seconds):
+        self.method = method
+        self.verb = verb
+        self.lines = lines
+        self.seconds = seconds              # method run time not spent in HTTP requests
+
+    def __repr__(self):
+        return ("ParseEvent(method={!r}, verb={!r}, lines={}, seconds={:.4f})"
+                .format(self.method, self.verb, self.lines, self.seconds))
+
+
+class RequestObserver:
+    """ Base class for instrumentation hooks, override the methods needed """
+
+    def on_request(self, event):
+        """ Called with a RequestEvent after each HTTP request completes or fails """
+
+    def on_parse(self, event):
+        """ Called with a ParseEvent after a public reader finishes parsing """
+
+
+class MetricsCollector(RequestObserver):
+    """ Observer that aggregates request and parse metrics per command verb """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._verbs = {}
+
+    def _verb(self, verb):
+        if verb not in self._verbs:
+            self._verbs[verb] = {
+                'requests': 0,
+                'errors': {},
+                'request_seconds': 0.0,
+                'bucket_counts': [0] * len(self.buckets),
+                'response_bytes': 0,
+                'lines': 0,
+                'parse_calls': 0,
+                'parse_seconds': 0.0,
+            }
+        return self._verbs[verb]
+
+    def on_request(self, event):
+        with self._lock:
+            stats = self._verb(event.verb)
+            stats['requests'] += 1
+            stats['request_seconds'] += event.seconds
+            stats['response_bytes'] += event.response_bytes
+            stats['lines'] += event.lines
+            for i, bound in enumerate(self.buckets):
+                if event.seconds <= bound:
+                    stats['bucket_counts'][i] += 1
+            if event.error:
+                stats['errors'][event.error] = stats['errors'].get(event.error, 0) + 1
+
+    def on_parse(self, event):
+        with self._lock:
+            stats = self._verb(event.verb)
+            stats['parse_calls'] += 1
+            stats['parse_seconds'] += event.seconds
+
+    def snapshot(self):
+        """
+        Return a copy of the collected metrics keyed by command verb.
+        """
+        with self._lock:
+            data = {}
+            for verb, stats in self._verbs.items():
+                data[verb] = dict(stats, errors=dict(stats['errors']),
+                                  bucket_counts=list(stats['bucket_counts']))
+            return data
+
+    def reset(self):
+        """ Clear all collected metrics """
+        with self._lock:
+            self._verbs = {}
+
+    def render(self, prefix='akips'):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        data = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+
+        metric('requests_total', 'counter', 'HTTP requests sent to AKiPS.')
+        for verb, stats in data.items():
+            lines.append(f'{prefix}_requests_total{{verb="{verb}"}} {stats["requests"]}')
+        metric('request_errors_total', 'counter', 'HTTP requests to AKiPS that failed.')
+        for verb, stats in data.items():
+            for error, count in stats['errors'].items():
+                lines.append(f'{prefix}_request_errors_total{{verb="{verb}",error="{error}"}} {count}')
+        metric('request_duration_seconds', 'histogram', 'Time until the full AKiPS response was received.')
+        for verb, stats in data.items():
+            for bound, count in zip(self.buckets, stats['bucket_counts']):
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{verb="{verb}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{verb="{verb}",le="+Inf"}} {stats["requests"]}')
+            lines.append(f'{prefix}_request_duration_seconds_sum{{verb="{verb}"}} {stats["request_seconds"]}')
+            lines.append(f'{prefix}_request_duration_seconds_count{{verb="{verb}"}} {stats["requests"]}')
+        metric('response_bytes_total', 'counter', 'Response body bytes received from AKiPS.')
+        for verb, stats in data.items():
+            lines.append(f'{prefix}_response_bytes_total{{verb="{verb}"}} {stats["response_bytes"]}')
+        metric('response_lines_total', 'counter', 'Response lines received from AKiPS.')
+        for verb, stats in data.items():
+            lines.append(f'{prefix}_response_lines_total{{verb="{verb}"}} {stats["lines"]}')
+        metric('parse_duration_seconds', 'summary', 'Time spent parsing AKiPS responses.')
+        for verb, stats in data.items():
+            lines.append(f'{prefix}_parse_duration_seconds_sum{{verb="{verb}"}} {stats["parse_seconds"]}')
+            lines.append(f'{prefix}_parse_duration_seconds_count{{verb="{verb}"}} {stats["parse_calls"]}')
+        return '\n'.join(lines) + '\n'
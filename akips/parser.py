@@ -0,0 +1,106 @@
+""" Line parsers for AKiPS Web API output.
+
+AKiPS returns 'plain/text' output with a fixed, space separated layout.  The
+parsers here take an iterable of lines (a split response body or a streamed
+response) and yield parsed fields.  Each parser tries a str.split fast path on
+the documented layout first and only falls back to a precompiled regex for
+lines that do not fit it.
+"""
+import re
+
+# Raw error message returned by AKiPS when a command fails
+ERROR_PREFIX = 'ERROR:'
+
+# parent child attribute = [value]
+MGET_PATTERN = re.compile(r'^(\S+)\s(\S+)\s(\S+)\s=(?:\s(.*))?$')
+# parent = group,group,...
+MGROUP_PATTERN = re.compile(r'^(\S+)\s=\s(.*)$')
+# epoch parent child attribute type flags details
+EVENT_PATTERN = re.compile(r'^(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(.*)$')
+# number,value,created,modified,description
+ENUM_PATTERN = re.compile(r'^(\S*),(\S*),(\S*),(\S*),(\S*)$')
+# OK|ERROR {mode} {group} {device} [{reason}] from web_manual_grouping_bulk
+BULK_GROUPING_PATTERN = re.compile(r'^(OK|ERROR) (\S+) (\S+) (\S+)(?: (.*))?$')
+# IP Address {address} is configured on {device}
+IP_LOOKUP_PATTERN = re.compile(r'IP Address (\S+) is configured on (\S+)')
+
+
+def is_error(text):
+    """
+    Return True if the response text is an AKiPS error message.
+    """
+    return text.startswith(ERROR_PREFIX)
+
+
+def parse_mget(lines):
+    """
+    Parse mget output.  Yields a (parent, child, attribute, value) tuple for each
+    line, with an empty string value when nothing follows the equals sign.
+    """
+    for line in lines:
+        parts = line.split(' ', 4)
+        if len(parts) >= 4 and parts[3] == '=' and parts[0] and parts[1] and parts[2]:
+            yield parts[0], parts[1], parts[2], parts[4] if len(parts) == 5 else ''
+        elif line:
+            match = MGET_PATTERN.match(line)
+            if match:
+                yield match.group(1), match.group(2), match.group(3), match.group(4) or ''
+
+
+def parse_mgroup(lines):
+    """
+    Parse mgroup output.  Yields a (parent, groups) tuple for each line.
+    """
+    for line in lines:
+        parts = line.split(' ', 2)
+        if len(parts) == 3 and parts[1] == '=' and parts[0]:
+            yield parts[0], parts[2].split(',')
+        elif line:
+            match = MGROUP_PATTERN.match(line)
+            if match:
+                yield match.group(1), match.group(2).split(',')
+
+
+def split_events(lines):
+    """
+    Parse mget event output.  Yields the seven fields of each event as a list
+    (epoch, parent, child, attribute, type, flags, details).
+    """
+    for line in lines:
+        parts = line.split(' ', 6)
+        if len(parts) == 7 and all(parts[:6]):
+            yield parts
+        elif line:
+            match = EVENT_PATTERN.match(line)
+            if match:
+                yield list(match.groups())
+
+
+def parse_events(lines):
+    """
+    Parse mget event output.  Yields an event dictionary for each line.
+    """
+    for parts in split_events(lines):
+        yield {
+            'epoch': parts[0],
+            'parent': parts[1],
+            'child': parts[2],
+            'attribute': parts[3],
+            'type': parts[4],
+            'flags': parts[5],
+            'details': parts[6],
+        }
+
+
+def split_enum(value):
+    """
+    Split an enum attribute value into its five fields (number, value, created,
+    modified, description).  Returns None if the value is not an enum.
+    """
+    parts = value.split(',')
+    if len(parts) == 5 and ' ' not in value:
+        return parts
+    match = ENUM_PATTERN.match(value)
+    if match:
+        return list(match.groups())
+    return None
@@ -0,0 +1,208 @@
+""" Composable AKiPS commands.
+
+A Query compiles to mget, mgroup or cseries syntax with the value, profile and
+group clauses applied by AKiPS itself, so only the matching data is sent and
+parsed.  Queries are immutable, each builder method returns a new Query.
+
+    query = (Query.mget('enum').attribute('IF-MIB.ifOperStatus')
+             .value('down').group('Cisco', 'Core', mode='all'))
+    data = api.query(query)
+
+Literal names are passed as they are when they are plain tokens and otherwise
+become an anchored, escaped regex.  Names, profiles and groups containing
+whitespace or other characters that would change the command are rejected
+with ValueError.
+"""
+import ipaddress
+import re
+
+# Commands a Query can compile to
+COMMANDS = ('mget', 'mgroup', 'cseries')
+
+# Group clause modes
+GROUP_MODES = ('any', 'all', 'not')
+
+# A literal that AKiPS reads as the exact name, e.g. sw1.example.com or Gi1/0/1
+PLAIN_TOKEN = re.compile(r'^[\w.:@-][\w.:@/-]*$')
+# A group or profile name, which AKiPS reads as one space separated word
+NAME_TOKEN = re.compile(r'^[^\s/]\S*$')
+# A time filter such as last1h, today or from 1708473600 to 1708477200
+TIME_FILTER = re.compile(r'^[\w:+-]+(?: [\w:+-]+)*$')
+# A forward slash not preceded by a backslash ends an AKiPS /regex/
+UNESCAPED_SLASH = re.compile(r'(?<!\\)/')
+
+
+def _escape(value):
+    """
+    Escape a literal value for an AKiPS /regex/, using \\s for whitespace so
+    the command stays one word.
+    """
+    return ''.join('\\s' if char.isspace() else re.escape(char).replace('/', '\\/') for char in value)
+
+
+def _check_regex(regex):
+    """
+    Validate a user supplied regex body and return it wrapped in slashes.
+    """
+    if not regex or re.search(r'\s', regex) or UNESCAPED_SLASH.search(regex):
+        raise ValueError(f"invalid regex {regex!r}, use \\s for whitespace and \\/ for slashes")
+    return f'/{regex}/'
+
+
+def _match_token(names, regex):
+    """
+    Build the token matching any of the literal names, or the regex.
+    """
+    if regex is not None:
+        if names:
+            raise ValueError("give names or a regex, not both")
+        return _check_regex(regex)
+    if not names:
+        return '*'
+    for name in names:
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"invalid name {name!r}")
+    if len(names) == 1 and PLAIN_TOKEN.match(names[0]):
+        return names[0]
+    return '/^(' + '|'.join(_escape(name) for name in names) + ')$/'
+
+
+def _check_name(name, kind):
+    if not isinstance(name, str) or not NAME_TOKEN.match(name):
+        raise ValueError(f"invalid {kind} name {name!r}")
+    return name
+
+
+class Query:
+    """ An mget, mgroup or cseries command built from filter clauses """
+    __slots__ = ('command', 'type', 'parent_match', 'child_match', 'attribute_match', 'value_clause',
+                 'profile_name', 'groups', 'period', 'operator')
+
+    def __init__(self, command='mget', type='*', parent_match='*', child_match='*', attribute_match='*',
+                 value_clause=None, profile_name=None, groups=(), period=None, operator='avg'):
+        if command not in COMMANDS:
+            raise ValueError(f"command must be one of {', '.join(COMMANDS)}")
+        self.command = command
+        self.type = type
+        self.parent_match = parent_match
+        self.child_match = child_match
+        self.attribute_match = attribute_match
+        self.value_clause = value_clause
+        self.profile_name = profile_name
+        self.groups = tuple(groups)
+        self.period = period
+        self.operator = operator
+
+    def _replace(self, **changes):
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Query(**fields)
+
+    @classmethod
+    def mget(cls, type='*'):
+        """ Attribute values of one type (text, enum, counter, ...) or all types """
+        return cls('mget', type=_match_token([type] if type != '*' else [], None))
+
+    @classmethod
+    def mgroup(cls):
+        """ Group membership of devices """
+        return cls('mgroup')
+
+    @classmethod
+    def cseries(cls, period='last1h', operator='avg', type='*'):
+        """ Counter time series over a time filter """
+        if not TIME_FILTER.match(period):
+            raise ValueError(f"invalid time filter {period!r}")
+        if not PLAIN_TOKEN.match(operator):
+            raise ValueError(f"invalid operator {operator!r}")
+        return cls('cseries', type=_match_token([type] if type != '*' else [], None),
+                   period=period, operator=operator)
+
+    def device(self, *names, regex=None):
+        """ Match devices by exact name, or by regex (without slashes) """
+        return self._replace(parent_match=_match_token(names, regex))
+
+    def child(self, *names, regex=None):
+        """ Match children (interfaces, sys, ping4, ...) by exact name or regex """
+        if self.command == 'mgroup':
+            raise ValueError("mgroup has no child filter")
+        return self._replace(child_match=_match_token(names, regex))
+
+    def attribute(self, *names, regex=None):
+        """ Match attributes by exact name or regex """
+        if self.command == 'mgroup':
+            raise ValueError("mgroup has no attribute filter")
+        return self._replace(attribute_match=_match_token(names, regex))
+
+    def value(self, value, regex=False):
+        """
+        Only return attributes with this value: an integer, an IP address, text,
+        or with regex=True a regex (without slashes).  Text that is not a plain
+        token is sent as an anchored regex.
+        """
+        if self.command != 'mget':
+            raise ValueError("only mget supports a value filter")
+        if regex:
+            clause = _check_regex(value)
+        elif isinstance(value, bool):
+            raise ValueError("value must be text, an integer or an IP address")
+        elif isinstance(value, (int, ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            clause = str(value)
+        elif isinstance(value, str) and value and PLAIN_TOKEN.match(value):
+            clause = value
+        elif isinstance(value, str):
+            clause = f'/^{_escape(value)}$/'
+        else:
+            raise ValueError("value must be text, an integer or an IP address")
+        return self._replace(value_clause=clause)
+
+    def profile(self, name):
+        """ Only return attributes of devices in this profile """
+        if self.command != 'mget':
+            raise ValueError("only mget supports a profile filter")
+        return self._replace(profile_name=_check_name(name, 'profile'))
+
+    def group(self, *names, mode='any'):
+        """
+        Add a group clause: devices in any or all of the groups, or in none of
+        them with mode='not'.  Several clauses may be combined.
+        """
+        if mode not in GROUP_MODES:
+            raise ValueError(f"mode must be one of {', '.join(GROUP_MODES)}")
+        if not names:
+            raise ValueError("at least one group is required")
+        names = tuple(_check_name(name, 'group') for name in names)
+        return self._replace(groups=self.groups + ((mode, names),))
+
+    def compile(self):
+        """
+        Return the AKiPS command string.
+        """
+        if self.command == 'mget':
+            words = ['mget', self.type, self.parent_match, self.child_match, self.attribute_match]
+            if self.value_clause is not None:
+                words += ['value', self.value_clause]
+            if self.profile_name is not None:
+                words += ['profile', self.profile_name]
+        elif self.command == 'mgroup':
+            words = ['mgroup', self.parent_match, '*']
+        else:
+            words = ['cseries', self.operator, 'time', self.period, self.type, self.parent_match,
+                     self.child_match, self.attribute_match]
+        for mode, names in self.groups:
+            words += [mode, 'group'] + list(names)
+        return ' '.join(words)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.compile() == other.compile()
+
+    def __hash__(self):
+        return hash(self.compile())
+
+    def __str__(self):
+        return self.compile()
+
+    def __repr__(self):
+        return "Query({!r})".format(self.compile())
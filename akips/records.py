@@ -0,0 +1,176 @@
+""" Compact record types for AKiPS results.
+
+These __slots__ classes are an opt-in alternative to the dictionaries returned
+by the AKIPS readers (pass as_records=True).  Epoch timestamps are kept as ints
+and only converted to timezone aware datetimes when the matching property is
+read.  to_dict() returns the dictionary shape of the matching reader.
+
+Event names, children, attributes, types and flags, and enum numbers and
+values, repeat across many records, so they are interned and each distinct
+string is stored once.
+"""
+import sys
+from datetime import datetime
+
+from akips import parser
+
+
+class Record:
+    """ Base class providing comparison, repr and dictionary conversion """
+    __slots__ = ()
+
+    def _fields(self):
+        return [name for name in self.__slots__ if not name.startswith('_')]
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self._fields())
+
+    def __repr__(self):
+        values = ", ".join("{}={!r}".format(name, getattr(self, name)) for name in self._fields())
+        return "{}({})".format(type(self).__name__, values)
+
+
+class Device(Record):
+    """ Key attributes of a device, as returned by get_devices """
+    __slots__ = ('name', 'ip4addr', 'sysName', 'sysDescr', 'sysLocation')
+
+    def __init__(self, name, ip4addr=None, sysName=None, sysDescr=None, sysLocation=None):
+        self.name = name
+        self.ip4addr = ip4addr
+        self.sysName = sysName
+        self.sysDescr = sysDescr
+        self.sysLocation = sysLocation
+
+    @classmethod
+    def from_attributes(cls, name, attributes):
+        """ Build from a get_devices attribute dictionary """
+        return cls(name,
+                   ip4addr=attributes.get('ip4addr'),
+                   sysName=attributes.get('SNMPv2-MIB.sysName'),
+                   sysDescr=attributes.get('SNMPv2-MIB.sysDescr'),
+                   sysLocation=attributes.get('SNMPv2-MIB.sysLocation'))
+
+    def to_dict(self):
+        return {
+            'ip4addr': self.ip4addr,
+            'SNMPv2-MIB.sysName': self.sysName,
+            'SNMPv2-MIB.sysDescr': self.sysDescr,
+            'SNMPv2-MIB.sysLocation': self.sysLocation,
+        }
+
+
+class Event(Record):
+    """ One entry from the AKiPS event log """
+    __slots__ = ('epoch', 'parent', 'child', 'attribute', 'type', 'flags', 'details', '_tzinfo')
+
+    def __init__(self, epoch, parent, child, attribute, type, flags, details, tzinfo=None):
+        self.epoch = int(epoch)
+        self.parent = sys.intern(parent)
+        self.child = sys.intern(child)
+        self.attribute = sys.intern(attribute)
+        self.type = sys.intern(type)
+        self.flags = sys.intern(flags)
+        self.details = details
+        self._tzinfo = tzinfo
+
+    @property
+    def time(self):
+        """ The event time as a datetime in the server's timezone """
+        return datetime.fromtimestamp(self.epoch, tz=self._tzinfo)
+
+    def to_dict(self):
+        return {
+            'epoch': str(self.epoch),
+            'parent': self.parent,
+            'child': self.child,
+            'attribute': self.attribute,
+            'type': self.type,
+            'flags': self.flags,
+            'details': self.details,
+        }
+
+
+class EnumValue(Record):
+    """ The five fields of an enum type attribute value """
+    __slots__ = ('number', 'value', 'created_epoch', 'modified_epoch', 'description', '_tzinfo')
+
+    def __init__(self, number, value, created_epoch, modified_epoch, description, tzinfo=None):
+        self.number = sys.intern(number)
+        self.value = sys.intern(value)
+        self.created_epoch = int(created_epoch)
+        self.modified_epoch = int(modified_epoch)
+        self.description = description
+        self._tzinfo = tzinfo
+
+    @classmethod
+    def from_string(cls, enum_string, tzinfo=None):
+        """ Parse an enum value string, returns None if it is not an enum """
+        fields = parser.split_enum(enum_string)
+        if not fields or not fields[2] or not fields[3]:
+            return None
+        return cls(*fields, tzinfo=tzinfo)
+
+    @property
+    def created(self):
+        """ Time created, as a datetime in the server's timezone """
+        return datetime.fromtimestamp(self.created_epoch, tz=self._tzinfo)
+
+    @property
+    def modified(self):
+        """ Time modified, as a datetime in the server's timezone """
+        return datetime.fromtimestamp(self.modified_epoch, tz=self._tzinfo)
+
+    def to_dict(self):
+        return {
+            'number': self.number,
+            'value': self.value,
+            'description': self.description,
+            'created': self.created,
+            'modified': self.modified,
+        }
+
+
+class UnreachableDevice(Record):
+    """ A device with a down ping or SNMP state, as returned by get_unreachable """
+    __slots__ = ('name', 'child', 'ping_state', 'snmp_state', 'index', 'device_added_epoch',
+                 'event_start_epoch', 'ip4addr', '_tzinfo')
+
+    def __init__(self, name, child=None, ping_state='n/a', snmp_state='n/a', index=None,
+                 device_added_epoch=None, event_start_epoch=None, ip4addr=None, tzinfo=None):
+        self.name = name
+        self.child = child
+        self.ping_state = ping_state
+        self.snmp_state = snmp_state
+        self.index = index
+        self.device_added_epoch = device_added_epoch
+        self.event_start_epoch = event_start_epoch
+        self.ip4addr = ip4addr
+        self._tzinfo = tzinfo
+
+    @property
+    def device_added(self):
+        """ Time the device was added, as a datetime in the server's timezone """
+        if self.device_added_epoch is None:
+            return None
+        return datetime.fromtimestamp(self.device_added_epoch, tz=self._tzinfo)
+
+    @property
+    def event_start(self):
+        """ Start of the outage, as a datetime in the server's timezone """
+        if self.event_start_epoch is None:
+            return None
+        return datetime.fromtimestamp(self.event_start_epoch, tz=self._tzinfo)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'ping_state': self.ping_state,
+            'snmp_state': self.snmp_state,
+            'event_start': self.event_start,
+            'child': self.child,
+            'index': self.index,
+            'device_added': self.device_added,
+            'ip4addr': self.ip4addr,
+        }
@@ -0,0 +1,267 @@
+""" Percentile and time bucket rollups of AKiPS time-series data.
+
+Rollups consume cseries rows (as yielded by AKIPS.iter_series with
+get_dict=False) one at a time and reduce each series with vectorized NumPy
+operations, so a month of minute samples for thousands of interfaces is
+processed without holding the whole result.
+
+iter_rollups yields one SeriesRollup per row and keeps nothing between rows.
+Rollup merges rows of the same (parent, child, attribute) from several
+requests, e.g. shards from `akips.export.series_shards`.  Counts, sums,
+min/max and buckets merge exactly.  For percentiles it keeps each series'
+values until results() is called.
+
+NumPy is required, install the akips[numpy] extra.
+"""
+from akips.columnar import SERIES_KEY_COLUMNS, np, require_numpy, to_float_array
+from akips.exceptions import AkipsError
+from akips.records import Record
+
+# Percentiles computed when none are given, 95th percentile billing
+DEFAULT_PERCENTILES = (95,)
+
+
+class SeriesRollup(Record):
+    """
+    Summary of one series.  percentiles maps each requested percentile to its
+    value.  With a bucket size, bucket_starts holds the start of each time
+    bucket as datetime64 and bucket_min, bucket_max and bucket_mean hold the
+    matching values.  Times are naive, in the server's timezone.
+    """
+    __slots__ = ('parent', 'child', 'description', 'attribute', 'count', 'min', 'max', 'mean',
+                 'percentiles', 'bucket_starts', 'bucket_min', 'bucket_max', 'bucket_mean')
+
+    def __init__(self, parent, child, description, attribute, count, min, max, mean,
+                 percentiles, bucket_starts=None, bucket_min=None, bucket_max=None, bucket_mean=None):
+        self.parent = parent
+        self.child = child
+        self.description = description
+        self.attribute = attribute
+        self.count = count
+        self.min = min
+        self.max = max
+        self.mean = mean
+        self.percentiles = percentiles
+        self.bucket_starts = bucket_starts
+        self.bucket_min = bucket_min
+        self.bucket_max = bucket_max
+        self.bucket_mean = bucket_mean
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    @property
+    def peak_bucket(self):
+        """ Start of the bucket with the highest mean, None without buckets or data """
+        if self.bucket_mean is None or np.isnan(self.bucket_mean).all():
+            return None
+        return self.bucket_starts[np.nanargmax(self.bucket_mean)]
+
+    @property
+    def peak_value(self):
+        """ Highest bucket mean, None without buckets or data """
+        if self.bucket_mean is None or np.isnan(self.bucket_mean).all():
+            return None
+        return float(np.nanmax(self.bucket_mean))
+
+    def to_dict(self):
+        """
+        Flat dictionary for `akips.export.write_records`, with a pNN key for
+        each percentile.  Missing values are None.
+        """
+        data = {
+            'parent': self.parent,
+            'child': self.child,
+            'description': self.description,
+            'attribute': self.attribute,
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+        }
+        for percentile, value in self.percentiles.items():
+            data['p{:g}'.format(percentile)] = value
+        if self.bucket_starts is not None:
+            peak = self.peak_bucket
+            data['peak_bucket'] = str(peak) if peak is not None else None
+            data['peak_value'] = self.peak_value
+        return data
+
+
+def _number(value):
+    """ Convert a NumPy scalar to a float, NaN to None """
+    value = float(value)
+    return None if value != value else value
+
+
+class _Columns:
+    """ Time layout shared by the rows under one cseries header """
+    __slots__ = ('width', 'starts', 'offsets')
+
+    def __init__(self, header, bucket):
+        if header[:len(SERIES_KEY_COLUMNS)] != SERIES_KEY_COLUMNS:
+            raise AkipsError(message=f'Unexpected cseries header: {header[:len(SERIES_KEY_COLUMNS)]}')
+        timestamps = np.array(header[len(SERIES_KEY_COLUMNS):], dtype='datetime64[s]')
+        self.width = len(timestamps)
+        self.starts = None
+        self.offsets = None
+        if bucket:
+            if len(timestamps) > 1 and (np.diff(timestamps) < np.timedelta64(0, 's')).any():
+                raise AkipsError(message='cseries timestamps are not in order')
+            epochs = timestamps.astype(np.int64)
+            bucket_ids = epochs - epochs % bucket
+            # timestamps are sorted, so each bucket is a contiguous run of columns
+            self.offsets = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+            self.starts = bucket_ids[self.offsets].astype('datetime64[s]')
+
+
+class _Accumulator:
+    """ Running totals for one (parent, child, attribute) """
+    __slots__ = ('description', 'count', 'total', 'min', 'max', 'chunks', 'buckets')
+
+    def __init__(self, description):
+        self.description = description
+        self.count = 0
+        self.total = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.chunks = []
+        self.buckets = []
+
+    def add(self, values, columns, keep_values):
+        valid = ~np.isnan(values)
+        count = int(valid.sum())
+        if count:
+            self.count += count
+            self.total += float(np.nansum(values))
+            self.min = np.fmin(self.min, np.nanmin(values))
+            self.max = np.fmax(self.max, np.nanmax(values))
+            if keep_values:
+                self.chunks.append(values[valid])
+        if columns.offsets is not None and len(values):
+            self.buckets.append((
+                columns.starts,
+                np.add.reduceat(valid.astype(np.int64), columns.offsets),
+                np.add.reduceat(np.where(valid, values, 0.0), columns.offsets),
+                np.fmin.reduceat(values, columns.offsets),
+                np.fmax.reduceat(values, columns.offsets),
+            ))
+
+    def result(self, key, percentiles, bucket):
+        if self.chunks and percentiles:
+            values = self.chunks[0] if len(self.chunks) == 1 else np.concatenate(self.chunks)
+            points = np.percentile(values, percentiles)
+            percentile_values = {p: float(v) for p, v in zip(percentiles, points)}
+        else:
+            percentile_values = {p: None for p in percentiles}
+        rollup = SeriesRollup(key[0], key[1], self.description, key[2], self.count,
+                              _number(self.min), _number(self.max),
+                              self.total / self.count if self.count else None, percentile_values)
+        if bucket:
+            self._set_buckets(rollup)
+        return rollup
+
+    def _set_buckets(self, rollup):
+        if not self.buckets:
+            empty = np.empty(0, dtype=np.float64)
+            rollup.bucket_starts = np.empty(0, dtype='datetime64[s]')
+            rollup.bucket_min, rollup.bucket_max, rollup.bucket_mean = empty, empty, empty
+            return
+        if len(self.buckets) == 1:
+            starts, counts, sums, mins, maxs = self.buckets[0]
+        else:
+            # the same bucket may be split across requests, combine by start time
+            starts, inverse = np.unique(np.concatenate([b[0] for b in self.buckets]), return_inverse=True)
+            counts = np.zeros(len(starts), dtype=np.int64)
+            sums = np.zeros(len(starts))
+            mins = np.full(len(starts), np.nan)
+            maxs = np.full(len(starts), np.nan)
+            np.add.at(counts, inverse, np.concatenate([b[1] for b in self.buckets]))
+            np.add.at(sums, inverse, np.concatenate([b[2] for b in self.buckets]))
+            np.fmin.at(mins, inverse, np.concatenate([b[3] for b in self.buckets]))
+            np.fmax.at(maxs, inverse, np.concatenate([b[4] for b in self.buckets]))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        rollup.bucket_starts = starts
+        rollup.bucket_min = mins
+        rollup.bucket_max = maxs
+        rollup.bucket_mean = means
+
+
+def _iter_series_values(rows, bucket):
+    """
+    Yield (key, description, values, columns) for each cseries row.  A
+    header row starts a new time layout, so the rows of several requests may
+    be chained together.
+    """
+    columns = None
+    for row in rows:
+        if not row:
+            continue
+        if row[0] == SERIES_KEY_COLUMNS[0] and row[:len(SERIES_KEY_COLUMNS)] == SERIES_KEY_COLUMNS:
+            columns = _Columns(row, bucket)
+            continue
+        if columns is None:
+            raise AkipsError(message='cseries rows must start with a header row')
+        values = row[len(SERIES_KEY_COLUMNS):]
+        if len(values) != columns.width:
+            raise AkipsError(message=f'cseries row for {row[0]} {row[1]} has {len(values)} values, '
+                                     f'expected {columns.width}')
+        yield (row[0], row[1], row[3]), row[2], to_float_array(values), columns
+
+
+def iter_rollups(rows, percentiles=DEFAULT_PERCENTILES, bucket=None):
+    """
+    Yield a SeriesRollup for each cseries row (lists, header row first) as it
+    is read.  bucket is the bucket size in seconds (3600 for hourly peaks),
+    aligned to the epoch.
+    """
+    require_numpy()
+    percentiles = tuple(percentiles)
+    for key, description, values, columns in _iter_series_values(rows, bucket):
+        accumulator = _Accumulator(description)
+        accumulator.add(values, columns, keep_values=bool(percentiles))
+        yield accumulator.result(key, percentiles, bucket)
+
+
+class Rollup:
+    """
+    Rollup of cseries rows merged by (parent, child, attribute) across requests.
+
+    rollup = Rollup(percentiles=(95, 99), bucket=3600)
+    for shard in series_shards(attribute='IF-MIB.ifHCInOctets', windows=windows):
+        rollup.add(api.iter_series(get_dict=False, **shard))
+    report = rollup.results()
+    """
+
+    def __init__(self, percentiles=DEFAULT_PERCENTILES, bucket=None):
+        require_numpy()
+        self.percentiles = tuple(percentiles)
+        self.bucket = bucket
+        self._series = {}
+
+    def __len__(self):
+        return len(self._series)
+
+    def add(self, rows):
+        """
+        Consume cseries rows (lists, header row first).  Returns the number of
+        series rows read.
+        """
+        count = 0
+        for key, description, values, columns in _iter_series_values(rows, self.bucket):
+            accumulator = self._series.get(key)
+            if accumulator is None:
+                accumulator = self._series[key] = _Accumulator(description)
+            accumulator.add(values, columns, keep_values=bool(self.percentiles))
+            count += 1
+        return count
+
+    def results(self):
+        """
+        Return a list of SeriesRollup, one per series, in first seen order.
+        """
+        return [accumulator.result(key, self.percentiles, self.bucket)
+                for key, accumulator in self._series.items()]
@@ -0,0 +1,187 @@
+""" Local SQLite snapshot of AKiPS inventory.
+
+A Snapshot stores the results of get_devices and get_group_membership in an
+indexed SQLite file so tools can answer lookups by name, IP address, sysName,
+location or group without pulling the whole inventory from AKiPS on startup.
+Query results use the same shapes as the AKIPS methods they mirror.
+"""
+import logging
+import sqlite3
+import time
+
+from akips import DEVICE_ATTRIBUTES
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+# Table column for each get_devices attribute
+DEVICE_COLUMNS = {
+    'ip4addr': 'ip4addr',
+    'SNMPv2-MIB.sysName': 'sysName',
+    'SNMPv2-MIB.sysDescr': 'sysDescr',
+    'SNMPv2-MIB.sysLocation': 'sysLocation',
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS devices (
+    name TEXT PRIMARY KEY,
+    ip4addr TEXT,
+    sysName TEXT,
+    sysDescr TEXT,
+    sysLocation TEXT
+);
+CREATE INDEX IF NOT EXISTS devices_ip4addr ON devices (ip4addr);
+CREATE INDEX IF NOT EXISTS devices_sysName ON devices (sysName);
+CREATE INDEX IF NOT EXISTS devices_sysLocation ON devices (sysLocation);
+CREATE TABLE IF NOT EXISTS group_membership (
+    device TEXT NOT NULL,
+    grp TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (device, grp)
+);
+CREATE INDEX IF NOT EXISTS group_membership_grp ON group_membership (grp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class Snapshot:
+    """ Class to persist and query a local copy of AKiPS inventory """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """ Close the SQLite connection """
+        self.conn.close()
+
+    @property
+    def refreshed(self):
+        """ Epoch of the last successful refresh, or None if never refreshed """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'refreshed'").fetchone()
+        return float(row[0]) if row else None
+
+    def refresh(self, api):
+        """
+        Pull devices and group memberships from AKiPS and apply only the
+        differences to the snapshot.  Returns counts of added, updated and
+        removed rows for each table.  A table is left untouched if AKiPS
+        returns no data for it.
+        """
+        devices = api.get_devices()
+        membership = api.get_group_membership()
+        changes = {}
+        with self.conn:
+            if devices is None:
+                logger.warning("No devices returned, keeping previous device snapshot")
+            else:
+                changes['devices'] = self._apply_devices(devices)
+            if membership is None:
+                logger.warning("No group membership returned, keeping previous group snapshot")
+            else:
+                changes['groups'] = self._apply_membership(membership)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('refreshed', ?)",
+                              (str(time.time()),))
+        logger.debug("Snapshot refresh changes: {}".format(changes))
+        return changes
+
+    def _apply_devices(self, devices):
+        columns = list(DEVICE_COLUMNS.values())
+        current = {row[0]: tuple(row[1:]) for row in
+                   self.conn.execute(f"SELECT name, {', '.join(columns)} FROM devices")}
+        added, updated = [], []
+        for name, attributes in devices.items():
+            row = tuple(attributes.get(attribute) for attribute in DEVICE_COLUMNS)
+            if name not in current:
+                added.append((name,) + row)
+            elif current[name] != row:
+                updated.append(row + (name,))
+        removed = [(name,) for name in current if name not in devices]
+
+        self.conn.executemany(f"INSERT INTO devices (name, {', '.join(columns)}) "
+                              f"VALUES (?{', ?' * len(columns)})", added)
+        self.conn.executemany(f"UPDATE devices SET {', '.join(c + ' = ?' for c in columns)} "
+                              "WHERE name = ?", updated)
+        self.conn.executemany("DELETE FROM devices WHERE name = ?", removed)
+        return {'added': len(added), 'updated': len(updated), 'removed': len(removed)}
+
+    def _apply_membership(self, membership):
+        current = self._membership("SELECT device, grp FROM group_membership ORDER BY device, position")
+        added, updated = [], []
+        for device, groups in membership.items():
+            if device not in current:
+                added.append(device)
+            elif current[device] != groups:
+                updated.append(device)
+        removed = [(device,) for device in current if device not in membership]
+
+        self.conn.executemany("DELETE FROM group_membership WHERE device = ?",
+                              removed + [(device,) for device in updated])
+        self.conn.executemany("INSERT INTO group_membership (device, grp, position) VALUES (?, ?, ?)",
+                              [(device, group, position)
+                               for device in added + updated
+                               for position, group in enumerate(membership[device])])
+        return {'added': len(added), 'updated': len(updated), 'removed': len(removed)}
+
+    # Queries
+
+    def _devices(self, where='', args=()):
+        columns = list(DEVICE_COLUMNS.values())
+        data = {}
+        for row in self.conn.execute(f"SELECT name, {', '.join(columns)} FROM devices {where} ORDER BY name", args):
+            data[row[0]] = dict(zip(DEVICE_ATTRIBUTES, row[1:]))
+        return data
+
+    def get_devices(self):
+        """ All devices, in the shape returned by AKIPS.get_devices """
+        return self._devices()
+
+    def get_device(self, name):
+        """ Key attributes for one device, or None if it is not in the snapshot """
+        return self._devices("WHERE name = ?", (name,)).get(name)
+
+    def find_by_ip(self, ip4addr):
+        """ Devices whose primary IPv4 address matches """
+        return self._devices("WHERE ip4addr = ?", (ip4addr,))
+
+    def find_by_sysname(self, sysname):
+        """ Devices whose SNMPv2-MIB.sysName matches """
+        return self._devices("WHERE sysName = ?", (sysname,))
+
+    def find_by_location(self, location):
+        """ Devices whose SNMPv2-MIB.sysLocation matches """
+        return self._devices("WHERE sysLocation = ?", (location,))
+
+    def _membership(self, query, args=()):
+        data = {}
+        for device, group in self.conn.execute(query, args):
+            data.setdefault(device, []).append(group)
+        return data
+
+    def get_group_membership(self, device=None, group=None):
+        """
+        Device to group mappings, in the shape returned by
+        AKIPS.get_group_membership.  Can be limited to one device and/or to
+        devices that are a member of one group.
+        """
+        query = "SELECT device, grp FROM group_membership"
+        clauses, args = [], []
+        if device is not None:
+            clauses.append("device = ?")
+            args.append(device)
+        if group is not None:
+            clauses.append("device IN (SELECT device FROM group_membership WHERE grp = ?)")
+            args.append(group)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        return self._membership(query + " ORDER BY device, position", args)
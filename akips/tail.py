@@ -0,0 +1,86 @@
+""" Incremental event tailing over the AKiPS event log.
+
+EventTailer remembers where the last poll ended and only asks AKiPS for the
+window since then, so the cost of each poll scales with the number of new
+events rather than with a fixed look-back period.
+"""
+import logging
+import time
+
+# Logging configuration
+logger = logging.getLogger(__name__)
+
+
+def event_identity(event):
+    """
+    Return a hashable identity for an event dictionary, used to drop duplicates
+    seen in overlapping poll windows.
+    """
+    return (event['epoch'], event['parent'], event['child'], event['attribute'],
+            event['type'], event['flags'], event['details'])
+
+
+class EventTailer:
+    """
+    Follow new AKiPS events.
+
+    Each poll requests `time from {cursor - overlap} to {now}`.  The overlap
+    picks up events written late or stamped by a server clock that runs behind
+    this host.  Events already returned are dropped from the overlap, so each
+    event is delivered once.  The cursor is an epoch and may be saved and
+    passed back as start to resume after a restart.
+    """
+
+    def __init__(self, api, event_type='all', start=None, overlap=60, interval=30,
+                 clock=time.time, sleep=time.sleep):
+        if overlap < 0:
+            raise ValueError("overlap must not be negative")
+        self.api = api
+        self.event_type = event_type
+        self.overlap = overlap
+        self.interval = interval
+        self.clock = clock
+        self.sleep = sleep
+        self.cursor = int(start) if start is not None else int(clock())
+        self._seen = {}
+
+    def poll(self):
+        """
+        Request events since the cursor and return the ones not returned before,
+        in the order AKiPS sent them.
+        """
+        start = self.cursor - self.overlap
+        end = int(self.clock())
+        period = f'from {start} to {end}'
+        events = []
+        newest = self.cursor
+        for event in self.api.iter_events(event_type=self.event_type, period=period):
+            identity = event_identity(event)
+            if identity in self._seen:
+                continue
+            epoch = int(event['epoch'])
+            self._seen[identity] = epoch
+            newest = max(newest, epoch)
+            events.append(event)
+
+        self.cursor = max(newest, end)
+        # Only events still inside the next overlap window can be returned again
+        horizon = self.cursor - self.overlap
+        self._seen = {identity: epoch for identity, epoch in self._seen.items() if epoch >= horizon}
+        logger.debug("Found {} new events between {} and {}".format(len(events), start, end))
+        return events
+
+    def follow(self, max_polls=None):
+        """
+        Generator that yields new events as they appear, sleeping interval
+        seconds between polls.  Runs forever unless max_polls is given.
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            if polls:
+                self.sleep(self.interval)
+            polls += 1
+            yield from self.poll()
+
+    def __iter__(self):
+        return self.follow()
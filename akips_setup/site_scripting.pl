@@ -62,6 +62,57 @@ sub web_manual_grouping
   adb_flush ();
 }
 
+sub web_manual_grouping_bulk
+{
+  # Usage: curl -s "https://{akips-server}/api-script?password={api-rw-pwd};function=web_manual_grouping_bulk;type=device;entries={mode},{group},{device_name}%0A{mode},{group},{device_name}"
+  #
+  # Applies many manual grouping changes with a single load and save of the
+  # grouping configuration.  Each entry is on its own line, mode is assign or clear.
+  # One result line is printed per entry:
+  #    OK {mode} {group} {device_name}
+  #    ERROR {mode} {group} {device_name} {reason}
+
+  my $type    = cgi_param ('type')    || "device";
+  my $entries = cgi_param ('entries') || "";
+  my ($line, $mode, $group, $device);
+
+  if ($entries eq "") {
+     errlog ($ERR_DEBUG, "entries is missing");
+     printf "ERROR - - - entries is missing\n";
+     return;
+  }
+
+  group_manual_load_cfg ();
+
+  foreach $line (split (/\r?\n/, $entries)) {
+     next if ($line =~ /^\s*$/);
+     ($mode, $group, $device) = split (",", $line, 3);
+     $mode   = "" unless defined $mode;
+     $group  = "" unless defined $group;
+     $device = "" unless defined $device;
+
+     if ($group eq "" || $device eq "") {
+        printf "ERROR %s %s %s group or device is missing\n", $mode || "-", $group || "-", $device || "-";
+        next;
+     }
+
+     if ($mode eq "assign") {
+        group_manual_assign ($type, $device, $group);
+     }
+     elsif ($mode eq "clear") {
+        group_manual_clear ($type, $device, $group);
+     }
+     else {
+        printf "ERROR %s %s %s mode must be assign or clear\n", $mode || "-", $group, $device;
+        next;
+     }
+     printf "OK %s %s %s\n", $mode, $group, $device;
+  }
+
+  group_manual_save_cfg ();
+  adb_flush ();
+}
+
 sub web_find_device_by_ip
 {
    # Usage: curl -s "https://{akips-server}/api-script?password={api-rw-pwd};function=web_find_device_by_ip;ipaddr={ip-address}"
@@ -99,4 +150,31 @@ sub web_find_device_by_ip
    }
    
    adb_flush ();
-}
\ No newline at end of file
+}
+
+sub web_export_ip2name
+{
+   # Usage: curl -s "https://{akips-server}/api-script?password={api-rw-pwd};function=web_export_ip2name"
+   #
+   # Dumps the whole IP address to device mapping in one pass, one
+   # "{ip-address},{device_name}" line per entry.
+
+   our $IP2NAME_CFG  = "${HOME_ETC}/ip2name.cfg";
+
+   my $IN;
+   my $line;
+   my %dev;
+
+   open ($IN, "<", $IP2NAME_CFG) or EXIT_FATAL ("Could not open $IP2NAME_CFG: $!");
+
+   while ($line = <$IN>) {
+      chomp $line;
+      %dev = ();
+      ($dev{devipaddr}, $dev{device}, $dev{ttime}) = split (",", $line);
+      next if (!defined $dev{device} || $dev{devipaddr} eq "");
+      printf "%s,%s\n", $dev{devipaddr}, $dev{device};
+   }
+   close $IN;
+
+   adb_flush ();
+}
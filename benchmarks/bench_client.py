@@ -0,0 +1,145 @@
+""" End-to-end benchmark of the AKIPS client against a local fake AKiPS server.
+
+Each public method is run against benchmarks/fake_akips.py over real HTTP.
+The report shows median latency, response throughput, parsed lines per second
+and peak Python memory.  Results can be saved as a baseline and later runs
+compared against it, exiting non-zero when a case regresses past the
+tolerance.
+
+Usage:
+    poetry run python benchmarks/bench_client.py [--devices 1000] [--runs 3]
+    poetry run python benchmarks/bench_client.py --save-baseline benchmarks/baseline.json
+    poetry run python benchmarks/bench_client.py --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fake_akips import FakeAkipsData, FakeAkipsServer
+
+from akips import AKIPS
+from akips.metrics import MetricsCollector
+
+
+def cases(api, data):
+    """ Benchmark cases as (name, callable) pairs """
+    names = [data.device_name(i) for i in range(0, data.devices, max(data.devices // 100, 1))]
+    return [
+        ('get_devices', lambda: api.get_devices()),
+        ('iter_devices', lambda: sum(1 for _ in api.iter_devices())),
+        ('get_device', lambda: api.get_device(data.device_name(0))),
+        ('get_devices_detail', lambda: api.get_devices_detail(names)),
+        ('get_device_by_ip', lambda: api.get_device_by_ip(data.device_ip(data.devices - 1), use_cache=False)),
+        ('get_ip_mapping', lambda: api.get_ip_mapping()),
+        ('get_unreachable', lambda: api.get_unreachable()),
+        ('get_group_membership', lambda: api.get_group_membership()),
+        ('get_status', lambda: api.get_status()),
+        ('get_events', lambda: api.get_events()),
+        ('get_events_records', lambda: api.get_events(as_records=True)),
+        ('get_series', lambda: api.get_series()),
+        ('iter_series', lambda: sum(1 for _ in api.iter_series(get_dict=False))),
+        ('get_aggregate', lambda: api.get_aggregate()),
+    ]
+
+
+def run_case(func, collector, runs):
+    """ Time a case, then run it once more under tracemalloc for peak memory """
+    seconds = []
+    collector.reset()
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    totals = {'response_bytes': 0, 'lines': 0}
+    for stats in collector.snapshot().values():
+        totals['response_bytes'] += stats['response_bytes']
+        totals['lines'] += stats['lines']
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_seconds = sum(seconds)
+    return {
+        'median_seconds': statistics.median(seconds),
+        'bytes_per_second': totals['response_bytes'] / total_seconds if total_seconds else 0.0,
+        'lines_per_second': totals['lines'] / total_seconds if total_seconds else 0.0,
+        'peak_bytes': peak,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """ Return a list of regression messages """
+    regressions = []
+    for name, result in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if not previous:
+            continue
+        for metric in ('median_seconds', 'peak_bytes'):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {result[metric]:.4g} > baseline {previous[metric]:.4g}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--devices', type=int, default=1000)
+    arg_parser.add_argument('--children', type=int, default=48)
+    arg_parser.add_argument('--points', type=int, default=60)
+    arg_parser.add_argument('--events', type=int, default=20000)
+    arg_parser.add_argument('--runs', type=int, default=3)
+    arg_parser.add_argument('--only', action='append', help="run only the named case (repeatable)")
+    arg_parser.add_argument('--baseline', help="compare against a saved baseline JSON file")
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="allowed slowdown or memory growth over the baseline (default 0.25)")
+    arg_parser.add_argument('--save-baseline', help="write the results to a baseline JSON file")
+    args = arg_parser.parse_args()
+
+    data = FakeAkipsData(devices=args.devices, children=args.children, points=args.points, events=args.events)
+    server = FakeAkipsServer(data)
+    server.start()
+    collector = MetricsCollector()
+    api = AKIPS(server.url, password='benchmark', observers=[collector])
+
+    results = {
+        'config': {'devices': args.devices, 'children': args.children, 'points': args.points,
+                   'events': args.events, 'runs': args.runs},
+        'cases': {},
+    }
+    print(f"{'case':22} {'median':>9} {'MB/s':>8} {'lines/s':>11} {'peak MB':>8}")
+    try:
+        for name, func in cases(api, data):
+            if args.only and name not in args.only:
+                continue
+            result = run_case(func, collector, args.runs)
+            results['cases'][name] = result
+            print(f"{name:22} {result['median_seconds']:8.3f}s {result['bytes_per_second'] / 1e6:8.1f} "
+                  f"{result['lines_per_second']:11.0f} {result['peak_bytes'] / 1e6:8.1f}")
+    finally:
+        server.stop()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print("Warning: baseline was recorded with a different configuration")
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+""" Micro-benchmark for the AKiPS line parsers.
+
+Compares the previous per-line re.match(pattern string) approach with the
+precompiled, split based parsers in akips.parser on synthetic output.
+
+Usage:
+    poetry run python benchmarks/bench_parser.py [--lines 1000000]
+"""
+import argparse
+import re
+import time
+
+from akips import parser
+
+
+def synthetic_mget(count):
+    """ Build mget style output lines for count interfaces """
+    lines = []
+    for i in range(count):
+        lines.append(f"switch{i // 48}.example.com Gi1/0/{i % 48} IF-MIB.ifAlias = uplink to building {i}")
+    return lines
+
+
+def synthetic_events(count):
+    """ Build mget event style output lines """
+    return [f"{1708524000 + i} switch{i // 48} Gi1/0/{i % 48} IF-MIB.ifOperStatus enum 0x1 Changed to down"
+            for i in range(count)]
+
+
+def legacy_mget(lines):
+    """ Parse the way the readers did before akips.parser existed """
+    rows = []
+    for line in lines:
+        match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s=(\s(.*))?$', line)
+        if match:
+            rows.append((match.group(1), match.group(2), match.group(3), match.group(5) or ''))
+    return rows
+
+
+def legacy_events(lines):
+    """ Parse the way get_events did before akips.parser existed """
+    rows = []
+    for line in lines:
+        match = re.match(r'^(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(\S+)\s(.*)$', line)
+        if match:
+            rows.append({
+                'epoch': match.group(1),
+                'parent': match.group(2),
+                'child': match.group(3),
+                'attribute': match.group(4),
+                'type': match.group(5),
+                'flags': match.group(6),
+                'details': match.group(7),
+            })
+    return rows
+
+
+def timed(func, lines):
+    """ Return (seconds, result) for one run """
+    start = time.perf_counter()
+    result = func(lines)
+    return time.perf_counter() - start, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--lines', type=int, default=1000000)
+    args = arg_parser.parse_args()
+
+    cases = [
+        ('mget', synthetic_mget(args.lines), legacy_mget, lambda lines: list(parser.parse_mget(lines))),
+        ('events', synthetic_events(args.lines), legacy_events, lambda lines: list(parser.parse_events(lines))),
+    ]
+    for name, lines, legacy, current in cases:
+        legacy_time, legacy_rows = timed(legacy, lines)
+        current_time, current_rows = timed(current, lines)
+        assert legacy_rows == current_rows, f"{name} parsers disagree"
+        print(f"{name:8} {len(lines):>9} lines  legacy {legacy_time:6.2f}s  "
+              f"parser {current_time:6.2f}s  speedup {legacy_time / current_time:4.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+""" Local stand-in for the AKiPS Web API, used by the benchmarks.
+
+FakeAkipsServer answers /api-db/ and /api-script/ requests with synthetic
+output in the AKiPS formats for a configurable number of devices, children
+per device and time points.  Responses are generated and written in chunks,
+so large outputs do not have to fit in the server's memory.
+
+Usage:
+    poetry run python benchmarks/fake_akips.py --devices 1000 --port 8080
+"""
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+START_EPOCH = 1708473600    # 2024-02-21 00:00 UTC
+GROUPS = ['admin', 'Cisco', 'Not-Core', 'OpsCenter', 'user']
+
+
+class FakeAkipsData:
+    """ Synthetic inventory shared by every generated response """
+
+    def __init__(self, devices=100, children=48, points=60, events=1000):
+        self.devices = devices
+        self.children = children
+        self.points = points
+        self.events = events
+
+    def device_name(self, i):
+        return f'switch{i:06d}.example.com'
+
+    def device_ip(self, i):
+        return f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}'
+
+    def _device_indexes(self, parent):
+        if parent.startswith('/^(') and parent.endswith(')$/'):
+            # alternation of literal names, as sent by get_devices_detail
+            names = parent[3:-3].replace('\\', '').split('|')
+        elif parent in ('*', '') or parent.startswith('/'):
+            return range(self.devices)
+        else:
+            names = [parent]
+        indexes = []
+        for name in names:
+            try:
+                index = int(name.split('.')[0][len('switch'):])
+            except ValueError:
+                continue
+            if 0 <= index < self.devices:
+                indexes.append(index)
+        return indexes
+
+    # api-db commands
+
+    def mget_sys(self, parent):
+        for i in self._device_indexes(parent):
+            name = self.device_name(i)
+            yield f'{name} sys ip4addr = {self.device_ip(i)}\n'
+            yield f'{name} sys SNMPv2-MIB.sysName = {name}\n'
+            yield f'{name} sys SNMPv2-MIB.sysDescr = Cisco IOS Software, C3750 Software, Version 15.0(2)SE11\n'
+            yield f'{name} sys SNMPv2-MIB.sysLocation = Building {i % 100} Room {i % 7}\n'
+
+    def mget_all(self, parent):
+        for i in self._device_indexes(parent):
+            name = self.device_name(i)
+            yield from self.mget_sys(name)
+            yield f'{name} ping4 PING.icmpState = 1,up,{START_EPOCH},{START_EPOCH + 60},{self.device_ip(i)}\n'
+            for c in range(self.children):
+                yield f'{name} Gi1/0/{c} IF-MIB.ifAlias = port {c}\n'
+                yield f'{name} Gi1/0/{c} IF-MIB.ifOperStatus = 1,up,{START_EPOCH},{START_EPOCH + c},Gi1/0/{c}\n'
+
+    def mget_enum(self, parent):
+        for i in self._device_indexes(parent):
+            name = self.device_name(i)
+            yield f'{name} ping4 PING.icmpState = 1,up,{START_EPOCH},{START_EPOCH + 60},{self.device_ip(i)}\n'
+            for c in range(self.children):
+                state = 'down' if (i + c) % 17 == 0 else 'up'
+                yield f'{name} Gi1/0/{c} IF-MIB.ifOperStatus = 1,{state},{START_EPOCH},{START_EPOCH + c},Gi1/0/{c}\n'
+
+    def mget_unreachable(self):
+        for i in range(0, self.devices, 20):
+            name = self.device_name(i)
+            yield f'{name} ping4 PING.icmpState = 1,down,{START_EPOCH},{START_EPOCH + i},{self.device_ip(i)}\n'
+            yield f'{name} sys SNMP.snmpState = 1,down,{START_EPOCH},{START_EPOCH + i},\n'
+
+    def mgroup(self, parent):
+        for i in self._device_indexes(parent):
+            groups = GROUPS + (['maintenance_mode'] if i % 50 == 0 else [])
+            yield f'{self.device_name(i)} = {",".join(groups)}\n'
+
+    def mget_event(self):
+        for e in range(self.events):
+            i = e % max(self.devices, 1)
+            state = 'down' if e % 2 else 'up'
+            yield (f'{START_EPOCH + e} {self.device_name(i)} Gi1/0/{e % max(self.children, 1)} '
+                   f'IF-MIB.ifOperStatus enum 0x1 Changed to {state}\n')
+
+    def _timestamps(self):
+        for p in range(self.points):
+            minute = p % 60
+            hour = (p // 60) % 24
+            day = 21 + p // 1440
+            yield f'2024-02-{day:02d} {hour:02d}:{minute:02d}'
+
+    def cseries(self, parent):
+        yield 'parent,child,child description,attribute,' + ','.join(self._timestamps()) + '\n'
+        for i in self._device_indexes(parent):
+            name = self.device_name(i)
+            for c in range(self.children):
+                values = ','.join(str((i * 7 + c * 13 + p) % 1000) for p in range(self.points))
+                yield f'{name},Gi1/0/{c},port {c},IF-MIB.ifHCInOctets,{values}\n'
+
+    def aggregate(self):
+        yield ','.join(str(p % 100) for p in range(self.points)) + '\n\n'
+
+    # api-script functions
+
+    def find_device_by_ip(self, ipaddr):
+        for i in range(self.devices):
+            if self.device_ip(i) == ipaddr:
+                yield f'IP Address {ipaddr} is configured on {self.device_name(i)}\n'
+                return
+        yield f'IP Address {ipaddr} is not configured on any devices\n'
+
+    def export_ip2name(self):
+        for i in range(self.devices):
+            yield f'{self.device_ip(i)},{self.device_name(i)}\n'
+
+    def respond(self, path, params):
+        """
+        Return a generator of output lines for one request.
+        """
+        if path.startswith('/api-script'):
+            function = params.get('function', '')
+            if function == 'web_find_device_by_ip':
+                return self.find_device_by_ip(params.get('ipaddr', ''))
+            if function == 'web_export_ip2name':
+                return self.export_ip2name()
+            if function in ('web_manual_grouping', 'web_manual_grouping_bulk'):
+                return iter([])
+            return iter([f'ERROR: unknown function {function}\n'])
+
+        words = params.get('cmds', '').split()
+        if not words:
+            return iter(['ERROR: no command\n'])
+        verb = words[0]
+        parent = words[2] if len(words) > 2 else '*'
+        if verb == 'mget' and len(words) > 1 and words[1] == 'event':
+            return self.mget_event()
+        if verb == 'mget' and words[1] == 'enum':
+            return self.mget_enum(parent)
+        if verb == 'mget' and 'value' in words:
+            return self.mget_unreachable()
+        if verb == 'mget' and len(words) > 3 and words[3] == 'sys':
+            return self.mget_sys(parent)
+        if verb == 'mget':
+            return self.mget_all(parent)
+        if verb == 'mgroup':
+            return self.mgroup(words[1] if len(words) > 1 else '*')
+        if verb == 'cseries':
+            # cseries avg time {filter} type parent child attribute, the filter may be 'from X to Y'
+            start = 3 + (4 if len(words) > 3 and words[3] == 'from' else 1)
+            return self.cseries(words[start + 1] if len(words) > start + 1 else '*')
+        if verb == 'aggregate':
+            return self.aggregate()
+        return iter([f'ERROR: unknown command {verb}\n'])
+
+
+class FakeAkipsHandler(BaseHTTPRequestHandler):
+    """ Request handler writing generated output in chunks """
+    protocol_version = 'HTTP/1.1'
+    # Small writes such as the final chunk would otherwise wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+    chunk_size = 64 * 1024
+
+    def log_message(self, format, *args):   # noqa: A002
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        lines = self.server.data.respond(url.path, params)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        buffer = []
+        size = 0
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size >= self.chunk_size:
+                self.wfile.write(self._chunk(''.join(buffer).encode()))
+                buffer = []
+                size = 0
+        # The last chunk and the terminator go out in one write
+        tail = self._chunk(''.join(buffer).encode()) if buffer else b''
+        self.wfile.write(tail + b'0\r\n\r\n')
+
+    def _chunk(self, data):
+        return f'{len(data):x}\r\n'.encode() + data + b'\r\n'
+
+
+class FakeAkipsServer(ThreadingHTTPServer):
+    """ Threaded HTTP server serving a FakeAkipsData inventory """
+    daemon_threads = True
+
+    def __init__(self, data, host='127.0.0.1', port=0):
+        self.data = data
+        super().__init__((host, port), FakeAkipsHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """ Serve requests on a background thread """
+        thread = threading.Thread(target=self.serve_forever, name='fake-akips', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--devices', type=int, default=1000)
+    arg_parser.add_argument('--children', type=int, default=48)
+    arg_parser.add_argument('--points', type=int, default=60)
+    arg_parser.add_argument('--events', type=int, default=10000)
+    arg_parser.add_argument('--port', type=int, default=8080)
+    args = arg_parser.parse_args()
+
+    data = FakeAkipsData(devices=args.devices, children=args.children, points=args.points, events=args.events)
+    server = FakeAkipsServer(data, port=args.port)
+    print(f"Serving fake AKiPS API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from akips.aio import AsyncAKIPS
+
+
+class AsyncAkipsTest(unittest.IsolatedAsyncioTestCase):
+
+    @patch('requests.Session.get')
+    async def test_get_device(self, session_mock: MagicMock):
+        r_text = """cisco-sw1 sys ip4addr = 10.0.0.1
+cisco-sw1 sys SNMPv2-MIB.sysName = cisco-sw1.example.com
+"""
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = r_text
+
+        async with AsyncAKIPS('127.0.0.1') as api:
+            device = await api.get_device('cisco-sw1')
+        self.assertEqual(device['sys']['ip4addr'], '10.0.0.1')
+        self.assertEqual(device['name'], 'cisco-sw1')
+
+    @patch('requests.Session.get')
+    async def test_get_device_many(self, session_mock: MagicMock):
+        def fake_get(url, params=None, **kwargs):
+            name = params['cmds'].split()[2]
+            response = MagicMock()
+            response.text = f"{name} sys ip4addr = 10.0.0.{name[-1]}\n"
+            return response
+        session_mock.side_effect = fake_get
+
+        async with AsyncAKIPS('127.0.0.1', max_concurrency=2) as api:
+            devices = await api.get_device_many(['sw1', 'sw2', 'sw3'])
+        self.assertEqual(list(devices.keys()), ['sw1', 'sw2', 'sw3'])
+        self.assertEqual(devices['sw3']['sys']['ip4addr'], '10.0.0.3')
+        self.assertEqual(session_mock.call_count, 3)
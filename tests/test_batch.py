@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS
+from akips.exceptions import AkipsError
+
+
+def fake_get(url, params=None, **kwargs):
+    response = MagicMock()
+    cmds = params['cmds']
+    if cmds.startswith('mgroup'):
+        response.text = "sw1 = admin,user\n"
+    elif cmds.startswith('aggregate'):
+        response.text = "1,2,3\n"
+    elif 'sw-missing' in cmds:
+        response.text = "ERROR: no such device\n"
+    else:
+        response.text = "sw1 sys ip4addr = 10.0.0.1\n"
+    return response
+
+
+class BatchTest(unittest.TestCase):
+
+    @patch('requests.Session.get')
+    def test_batch(self, session_mock: MagicMock):
+        session_mock.side_effect = fake_get
+        api = AKIPS('127.0.0.1')
+        with api.batch(max_workers=3) as batch:
+            device = batch.get_device('sw1')
+            groups = batch.get_group_membership(device='sw1')
+            aggregate = batch.get_aggregate(device='sw1')
+            self.assertFalse(device.done)
+            self.assertRaises(AkipsError, device.result)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(session_mock.call_count, 3)
+        self.assertEqual(device.result()['sys']['ip4addr'], '10.0.0.1')
+        self.assertEqual(groups.result(), {'sw1': ['admin', 'user']})
+        self.assertEqual(aggregate.result(), ['1', '2', '3'])
+
+    @patch('requests.Session.get')
+    def test_batch_error(self, session_mock: MagicMock):
+        session_mock.side_effect = fake_get
+        api = AKIPS('127.0.0.1')
+        with api.batch() as batch:
+            missing = batch.get_device('sw-missing')
+            device = batch.get_device('sw1')
+        self.assertIsInstance(missing.exception(), AkipsError)
+        self.assertRaises(AkipsError, missing.result)
+        self.assertEqual(device.result()['name'], 'sw1')
+
+    @patch('requests.Session.get')
+    def test_batch_not_run_on_exception(self, session_mock: MagicMock):
+        api = AKIPS('127.0.0.1')
+        with self.assertRaises(ValueError):
+            with api.batch() as batch:
+                batch.get_device('sw1')
+                raise ValueError("page failed")
+        self.assertFalse(session_mock.called)
+        self.assertRaises(AttributeError, getattr, batch, 'set_group_membership')
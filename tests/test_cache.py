@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS
+from akips.cache import AkipsCache, TTLCache
+
+
+class FakeTimer:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_ttl_expiry(self):
+        timer = FakeTimer()
+        cache = TTLCache(ttl=10, timer=timer)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), (True, 1))
+        timer.now = 11
+        self.assertEqual(cache.get('a'), (False, None))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 0, 'size': 0})
+
+    def test_lru_eviction(self):
+        cache = TTLCache(ttl=10, maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_disabled_method(self):
+        cache = AkipsCache(ttls={'get_device': 0})
+        cache.set('get_device', 'sw1', {})
+        self.assertEqual(cache.get('get_device', 'sw1'), (False, None))
+
+    @patch('requests.Session.get')
+    def test_get_device_by_ip_cached(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "IP Address 10.194.200.65 is configured on cisco-sw1\n"
+
+        api = AKIPS('127.0.0.1')
+        self.assertEqual(api.get_device_by_ip('10.194.200.65'), 'cisco-sw1')
+        self.assertEqual(api.get_device_by_ip('10.194.200.65'), 'cisco-sw1')
+        self.assertEqual(session_mock.call_count, 1)
+        self.assertEqual(api.get_device_by_ip('10.194.200.65', use_cache=False), 'cisco-sw1')
+        self.assertEqual(session_mock.call_count, 2)
+        self.assertEqual(api.cache.stats()['get_device_by_ip']['hits'], 1)
+
+    @patch('requests.Session.get')
+    def test_set_group_membership_invalidates(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "sw1 = admin,user\n"
+
+        api = AKIPS('127.0.0.1')
+        api.get_group_membership(use_cache=True)
+        api.get_group_membership(use_cache=True)
+        self.assertEqual(session_mock.call_count, 1)
+
+        session_mock.return_value.text = ""
+        api.set_group_membership('sw1', 'maintenance_mode', 'assign')
+        session_mock.return_value.text = "sw1 = admin,maintenance_mode,user\n"
+        groups = api.get_group_membership(use_cache=True)
+        self.assertEqual(session_mock.call_count, 3)
+        self.assertIn('maintenance_mode', groups['sw1'])
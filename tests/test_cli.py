@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import cli
+
+
+def fake_get(url, params=None, **kwargs):
+    response = MagicMock()
+    cmds = params['cmds']
+    if cmds.startswith('cseries'):
+        start = int(cmds.split()[4])
+        lines = [f"parent,child,child description,attribute,{start},{start + 60}",
+                 f"sw1,Gi1/0/1,uplink,IF-MIB.ifHCInOctets,{start % 1000},7",
+                 f"sw1,Gi1/0/2,downlink,IF-MIB.ifHCInOctets,{start % 997},9"]
+    else:
+        lines = ["sw1 sys ip4addr = 10.0.0.1",
+                 "sw1 sys SNMPv2-MIB.sysName = sw1.example.com"]
+    response.iter_lines.return_value = iter(lines)
+    return response
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    @patch('requests.Session.get')
+    def test_devices_ndjson(self, session_mock: MagicMock):
+        session_mock.side_effect = fake_get
+        code = cli.main(['devices', '--server', '127.0.0.1', '--output', self.path('devices.ndjson'), '-q'])
+        self.assertEqual(code, 0)
+        with open(self.path('devices.ndjson')) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(records, [{'name': 'sw1', 'ip4addr': '10.0.0.1', 'SNMPv2-MIB.sysName': 'sw1.example.com',
+                                    'SNMPv2-MIB.sysDescr': None, 'SNMPv2-MIB.sysLocation': None}])
+
+    def series_args(self, output, checkpoint):
+        return ['series', '--server', '127.0.0.1', '--format', 'csv', '--output', output,
+                '--start', '1708473600', '--end', '1708480800', '--window', '3600',
+                '--checkpoint', checkpoint, '--workers', '2', '-q']
+
+    @patch('requests.Session.get')
+    def test_series_checkpoint_resume(self, session_mock: MagicMock):
+        session_mock.side_effect = fake_get
+        expected = self.path('expected.csv')
+        self.assertEqual(cli.main(self.series_args(expected, self.path('expected.ckpt'))), 0)
+        with open(expected) as f:
+            complete = f.read()
+        self.assertEqual(len(complete.splitlines()), 1 + 2 * 4)
+
+        output, checkpoint = self.path('series.csv'), self.path('series.ckpt')
+        calls = []
+
+        def interrupted(rows):
+            # stop part way through the second shard, after some rows were written
+            calls.append(rows)
+            for i, row in enumerate(cli_long_rows(rows)):
+                if len(calls) == 2 and i == 2:
+                    raise KeyboardInterrupt
+                yield row
+        cli_long_rows = cli.long_rows
+        with patch('akips.cli.long_rows', interrupted):
+            self.assertRaises(KeyboardInterrupt, cli.main, self.series_args(output, checkpoint))
+        done, offset = cli.read_checkpoint(checkpoint)
+        self.assertEqual(len(done), 1)
+        self.assertGreater(os.path.getsize(output), offset)
+
+        session_mock.reset_mock()
+        self.assertEqual(cli.main(self.series_args(output, checkpoint)), 0)
+        self.assertEqual(session_mock.call_count, 1)
+        with open(output) as f:
+            self.assertEqual(f.read(), complete)
+
+    @patch('requests.Session.get')
+    def test_resume_without_output(self, session_mock: MagicMock):
+        session_mock.side_effect = fake_get
+        output, checkpoint = self.path('series.csv'), self.path('series.ckpt')
+        self.assertEqual(cli.main(self.series_args(output, checkpoint)), 0)
+        os.remove(output)
+        self.assertEqual(cli.main(self.series_args(output, checkpoint)), 1)
+
+    def test_checkpoint_requires_output(self):
+        with self.assertRaises(SystemExit):
+            cli.main(['series', '--server', '127.0.0.1', '--checkpoint', self.path('x.ckpt')])
@@ -0,0 +1,96 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import requests
+from akips.cluster import AKIPSCluster, ClusterTimeout
+
+
+class ClusterTest(unittest.TestCase):
+
+    @patch('requests.Session.get')
+    def test_get_events_merged(self, session_mock: MagicMock):
+        def fake_get(url, params=None, **kwargs):
+            response = MagicMock()
+            if 'east' in url:
+                response.text = ("1708473605 sw-east1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to down\n"
+                                 "1708473615 sw-east1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to up\n")
+            else:
+                response.text = "1708473610 sw-west1 Gi1/0/2 IF-MIB.ifOperStatus enum 0x1 Changed to down\n"
+            return response
+        session_mock.side_effect = fake_get
+
+        with AKIPSCluster(['akips-east', 'akips-west']) as cluster:
+            result = cluster.get_events()
+        self.assertFalse(result.partial)
+        self.assertEqual([event['epoch'] for event in result.data], ['1708473605', '1708473610', '1708473615'])
+        self.assertEqual([event['server'] for event in result.data], ['akips-east', 'akips-west', 'akips-east'])
+
+    @patch('requests.Session.get')
+    def test_server_down(self, session_mock: MagicMock):
+        def fake_get(url, params=None, **kwargs):
+            if 'west' in url:
+                raise requests.exceptions.ConnectionError("connection refused")
+            response = MagicMock()
+            response.text = "sw-east1 sys ip4addr = 10.0.0.1\n"
+            return response
+        session_mock.side_effect = fake_get
+
+        with AKIPSCluster(['akips-east', 'akips-west'], retries=0) as cluster:
+            result = cluster.get_devices()
+        self.assertTrue(result.partial)
+        self.assertEqual(result.servers, ['akips-east'])
+        self.assertIsInstance(result.errors['akips-west'], requests.exceptions.ConnectionError)
+        self.assertEqual(result.data['sw-east1']['ip4addr'], '10.0.0.1')
+        self.assertEqual(result.data['sw-east1']['server'], 'akips-east')
+
+    @patch('requests.Session.get')
+    def test_timeout(self, session_mock: MagicMock):
+        release = threading.Event()
+
+        def fake_get(url, params=None, **kwargs):
+            if 'west' in url:
+                release.wait(5)
+            response = MagicMock()
+            response.text = "sw1 = admin\n"
+            return response
+        session_mock.side_effect = fake_get
+
+        cluster = AKIPSCluster(['akips-east', 'akips-west'], timeout=0.1)
+        try:
+            result = cluster.get_group_membership()
+        finally:
+            release.set()
+            cluster.close()
+        self.assertIsInstance(result.errors['akips-west'], ClusterTimeout)
+        self.assertEqual(result.data, {'sw1': {'groups': ['admin'], 'server': 'akips-east'}})
+
+    @patch('requests.Session.get')
+    def test_slow_server_does_not_starve_others(self, session_mock: MagicMock):
+        release = threading.Event()
+
+        def fake_get(url, params=None, **kwargs):
+            if 'slow' in url:
+                release.wait(5)
+            response = MagicMock()
+            response.text = "sw1 = admin\n"
+            return response
+        session_mock.side_effect = fake_get
+
+        cluster = AKIPSCluster(['akips-slow', 'akips-fast'], timeout=0.1)
+        try:
+            first = cluster.get_group_membership()
+            second = cluster.get_group_membership()
+        finally:
+            release.set()
+            cluster.close()
+        for result in (first, second):
+            self.assertEqual(result.servers, ['akips-fast'])
+            self.assertIsInstance(result.errors['akips-slow'], ClusterTimeout)
+        # the busy server is not sent a second request
+        slow_calls = [c for c in session_mock.call_args_list if 'slow' in c.args[0]]
+        self.assertEqual(len(slow_calls), 1)
+
+    def test_request_timeout(self):
+        with AKIPSCluster(['akips-east'], timeout=10, request_timeout=(3, 20)) as cluster:
+            self.assertEqual(cluster.clients['akips-east'].timeout, (3, 20))
+            self.assertEqual(cluster.timeout, 10)
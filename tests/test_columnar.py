@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS, AkipsError
+from akips.columnar import SeriesTable, np
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class ColumnarTest(unittest.TestCase):
+
+    def test_series_table(self):
+        lines = [
+            "parent,child,child description,attribute,2024-02-21 09:10,2024-02-21 09:11",
+            "sw1,Gi1/0/1,uplink,IF-MIB.ifHCInOctets,10,",
+            "sw2,Gi1/0/2,,IF-MIB.ifHCInOctets,3,4",
+            "",
+        ]
+        table = SeriesTable.from_lines(lines)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.values.dtype, np.float64)
+        self.assertEqual(table.values.shape, (2, 2))
+        self.assertEqual(table.timestamps[1], np.datetime64('2024-02-21T09:11'))
+        self.assertTrue(np.isnan(table.values[0, 1]))
+        self.assertEqual(table.values[1].sum(), 7.0)
+        self.assertEqual(list(table.parents), ['sw1', 'sw2'])
+        self.assertEqual(table.descriptions[0], 'uplink')
+
+    def test_series_table_bad_header(self):
+        self.assertRaises(AkipsError, SeriesTable.from_lines, ["a,b,c\n"])
+
+    @patch('requests.Session.get')
+    def test_get_series_columnar(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter([
+            "parent,child,child description,attribute,2024-02-21 09:10",
+            "sw1,radio.1,,WLSX-WLAN-MIB.wlanAPRadioNumAssociatedClients,5",
+        ])
+
+        api = AKIPS('127.0.0.1')
+        table = api.get_series(columnar=True)
+        self.assertEqual(table.values[0, 0], 5.0)
+
+    @patch('requests.Session.get')
+    def test_get_aggregate_array(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "30,31,30\n\n"
+
+        api = AKIPS('127.0.0.1')
+        values = api.get_aggregate(as_array=True)
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(values.tolist(), [30.0, 31.0, 30.0])
@@ -1,6 +1,8 @@
 import unittest
 from unittest.mock import MagicMock, patch
-from akips import AKIPS, AkipsError
+from urllib.parse import quote
+import requests
+from akips import AKIPS, STREAM_CHUNK_SIZE, AkipsError, diff_status
 
 
 class AkipsTest(unittest.TestCase):
@@ -117,3 +119,185 @@ CrN-638-AP_111B,radio.0.11.134.253.238.238.1,,WLSX-WLAN-MIB.wlanAPRadioNumAssoci
         api = AKIPS('127.0.0.1')
         output = api.set_group_membership('10.10.10.146', 'test_group', 'assign')
         self.assertIsNone(output)
+
+    @patch('requests.Session.get')
+    def test_iter_devices(self, session_mock: MagicMock):
+        r_lines = [
+            "192.168.1.29 sys ip4addr = 192.168.1.29",
+            "192.168.1.29 sys SNMPv2-MIB.sysName = server.example.com",
+            "192.168.1.30 sys ip4addr = 192.168.1.30",
+            "",
+        ]
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(r_lines)
+
+        api = AKIPS('127.0.0.1')
+        devices = list(api.iter_devices())
+        self.assertEqual(len(devices), 2)
+        self.assertEqual(devices[0][0], '192.168.1.29')
+        self.assertEqual(devices[0][1]['SNMPv2-MIB.sysName'], 'server.example.com')
+        self.assertIsNone(devices[1][1]['SNMPv2-MIB.sysName'])
+        self.assertTrue(session_mock.call_args.kwargs['stream'])
+        self.assertEqual(session_mock.return_value.iter_lines.call_args.kwargs['chunk_size'], STREAM_CHUNK_SIZE)
+
+    @patch('requests.Session.get')
+    def test_iter_events(self, session_mock: MagicMock):
+        r_lines = [
+            "1708524000 sw1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to down",
+            "1708524060 sw1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to up",
+        ]
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(r_lines)
+
+        api = AKIPS('127.0.0.1')
+        events = api.iter_events()
+        event = next(events)
+        self.assertEqual(event['parent'], 'sw1')
+        self.assertEqual(event['details'], 'Changed to down')
+        self.assertEqual(len(list(events)), 1)
+
+    @patch('requests.Session.get')
+    def test_iter_series(self, session_mock: MagicMock):
+        r_lines = [
+            "parent,child,child description,attribute,2024-02-21 09:10,2024-02-21 09:11",
+            "CrN-638-AP_110,radio.1,,WLSX-WLAN-MIB.wlanAPRadioNumAssociatedClients,0,1",
+            "CrN-638-AP_111B,radio.1,,WLSX-WLAN-MIB.wlanAPRadioNumAssociatedClients,2,3",
+        ]
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(r_lines)
+
+        api = AKIPS('127.0.0.1')
+        series = list(api.iter_series(attribute='WLSX-WLAN-MIB.wlanAPRadioNumAssociatedClients'))
+        self.assertEqual(series[0]['2024-02-21 09:10'], '0')
+        self.assertEqual(series[1]['2024-02-21 09:11'], '3')
+
+    @patch('requests.Session.get')
+    def test_iter_lines_error(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(["ERROR: api-db invalid username/password"])
+
+        api = AKIPS('127.0.0.1')
+        self.assertRaises(AkipsError, list, api.iter_group_membership())
+
+    @patch('requests.Session.get')
+    def test_get_devices_detail(self, session_mock: MagicMock):
+        r_text = """sw1 sys ip4addr = 10.0.0.1
+sw1 Gi1/0/1 IF-MIB.ifAlias =
+sw2 sys ip4addr = 10.0.0.2
+"""
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = r_text
+
+        api = AKIPS('127.0.0.1')
+        devices = api.get_devices_detail(['sw1', 'sw2', 'sw3'])
+        self.assertEqual(session_mock.call_count, 1)
+        self.assertEqual(session_mock.call_args.kwargs['params']['cmds'], 'mget * /^(sw1|sw2|sw3)$/ * *')
+        self.assertEqual(devices['sw1']['sys']['ip4addr'], '10.0.0.1')
+        self.assertEqual(devices['sw1']['Gi1/0/1']['IF-MIB.ifAlias'], '')
+        self.assertEqual(devices['sw2']['name'], 'sw2')
+        self.assertNotIn('sw3', devices)
+
+    @patch('requests.Session.get')
+    def test_get_devices_detail_chunks(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = ""
+
+        api = AKIPS('127.0.0.1')
+        names = [f'device-{i}.example.com' for i in range(500)]
+        api.get_devices_detail(names, attributes=['ip4addr'], max_cmd_length=1000)
+        self.assertGreater(session_mock.call_count, 1)
+        sent = []
+        for call in session_mock.call_args_list:
+            cmds = call.kwargs['params']['cmds']
+            self.assertTrue(cmds.endswith(' * /^(ip4addr)$/'))
+            self.assertLessEqual(len(quote(cmds)), 1000)
+            sent.extend(cmds.split()[2][3:-3].split('|'))
+        self.assertEqual(len(sent), 500)
+
+    @patch('requests.Session.get')
+    def test_set_group_memberships(self, session_mock: MagicMock):
+        r_text = """OK assign maintenance_mode 10.10.10.146
+ERROR clear maintenance_mode 10.10.20.31 group or device is missing
+""" # noqa
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = r_text
+
+        api = AKIPS('127.0.0.1')
+        results = api.set_group_memberships([
+            ('10.10.10.146', 'maintenance_mode', 'assign'),
+            ('10.10.20.31', 'maintenance_mode', 'clear'),
+            ('10.10.30.26', 'maintenance_mode', 'assign'),
+        ])
+        self.assertEqual(session_mock.call_count, 1)
+        params = session_mock.call_args.kwargs['params']
+        self.assertEqual(params['function'], 'web_manual_grouping_bulk')
+        self.assertEqual(params['entries'].split('\n')[0], 'assign,maintenance_mode,10.10.10.146')
+        self.assertTrue(results[0]['ok'])
+        self.assertEqual(results[1]['error'], 'group or device is missing')
+        self.assertEqual(results[2]['error'], 'no result returned')
+
+    @patch('requests.Session.get')
+    def test_set_group_memberships_partial_failure(self, session_mock: MagicMock):
+        ok = MagicMock(ok=True, status_code=200, text="OK assign maintenance_mode sw1\n")
+        session_mock.side_effect = [ok, requests.exceptions.ReadTimeout("read timed out")]
+
+        api = AKIPS('127.0.0.1', retries=0)
+        entry_length = len(quote('assign,maintenance_mode,sw1\n', safe=''))
+        results = api.set_group_memberships([
+            ('sw1', 'maintenance_mode', 'assign'),
+            ('sw2', 'maintenance_mode', 'assign'),
+            ('sw3', 'maintenance_mode', 'assign'),
+        ], max_cmd_length=entry_length)
+        self.assertEqual(session_mock.call_count, 2)
+        self.assertTrue(results[0]['ok'])
+        self.assertEqual(results[1]['error'], 'request failed: ReadTimeout')
+        self.assertEqual(results[2]['error'], 'not sent')
+        self.assertFalse(results[2]['ok'])
+
+    @patch('requests.Session.get')
+    def test_set_group_memberships_invalid(self, session_mock: MagicMock):
+        api = AKIPS('127.0.0.1')
+        self.assertRaises(ValueError, api.set_group_memberships, [('sw1', 'maintenance_mode', 'add')])
+        self.assertRaises(ValueError, api.set_group_memberships, [('sw 1', 'maintenance_mode', 'assign')])
+        self.assertFalse(session_mock.called)
+
+    @patch('requests.Session.get')
+    def test_get_status(self, session_mock: MagicMock):
+        r_lines = [
+            "sw1 Gi1/0/1 IF-MIB.ifOperStatus = 1,up,1484685257,1657029502,uplink",
+            "sw1 Gi1/0/2 IF-MIB.ifOperStatus = 2,down,1484685257,1657029502,",
+            "sw1 ping4 PING.icmpState = 2,up,1484685257,1657029502,10.0.0.1",
+        ]
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(r_lines)
+
+        api = AKIPS('127.0.0.1')
+        status = api.get_status(device='sw1', profile='Switches', groups=['core'])
+        self.assertEqual(session_mock.call_args.kwargs['params']['cmds'],
+                         'mget enum sw1 * * profile Switches any group core')
+        self.assertEqual(len(status), 3)
+        self.assertEqual(status[('sw1', 'Gi1/0/2', 'IF-MIB.ifOperStatus')].value, 'down')
+        self.assertEqual(status[('sw1', 'Gi1/0/1', 'IF-MIB.ifOperStatus')].description, 'uplink')
+
+        session_mock.return_value.iter_lines.return_value = iter([
+            "sw1 Gi1/0/1 IF-MIB.ifOperStatus = 1,up,1484685257,1657029502,uplink",
+            "sw1 Gi1/0/2 IF-MIB.ifOperStatus = 1,up,1484685257,1657029999,",
+            "sw2 ping4 PING.icmpState = 2,up,1484685257,1657029502,10.0.0.2",
+        ])
+        changes = diff_status(status, api.get_status())
+        self.assertEqual(set(changes), {
+            ('sw1', 'Gi1/0/2', 'IF-MIB.ifOperStatus'),
+            ('sw1', 'ping4', 'PING.icmpState'),
+            ('sw2', 'ping4', 'PING.icmpState'),
+        })
+        old, new = changes[('sw1', 'Gi1/0/2', 'IF-MIB.ifOperStatus')]
+        self.assertEqual((old.value, new.value), ('down', 'up'))
+        self.assertIsNone(changes[('sw1', 'ping4', 'PING.icmpState')][1])
@@ -0,0 +1,97 @@
+import io
+import json
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from akips.export import export_series, iter_series_rows, iter_shard_results, series_shards, time_windows
+
+HEADER = ['parent', 'child', 'child description', 'attribute', '2024-02-21 09:10', '2024-02-21 09:11']
+
+
+class ExportTest(unittest.TestCase):
+
+    def test_time_windows(self):
+        self.assertEqual(time_windows(0, 250, 100), ['from 0 to 100', 'from 100 to 200', 'from 200 to 250'])
+        self.assertRaises(ValueError, time_windows, 0, 10, 0)
+
+    def test_series_shards(self):
+        shards = series_shards(attribute='IF-MIB.ifHCInOctets', groups=['core', 'edge'],
+                               windows=['from 0 to 100', 'from 100 to 200'])
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(shards[1], {'device': '*', 'group_filter': 'any', 'groups': ['core'],
+                                     'period': 'from 100 to 200', 'attribute': 'IF-MIB.ifHCInOctets'})
+        self.assertEqual([s['device'] for s in series_shards(devices=['/^a/', '/^b/'])], ['/^a/', '/^b/'])
+        self.assertRaises(ValueError, series_shards, groups=['core'], devices=['/^a/'])
+
+    def test_rows_in_shard_order(self):
+        running = []
+        lock = threading.Lock()
+
+        def fake_iter_series(get_dict=True, device='*', **kwargs):
+            with lock:
+                running.append(device)
+            # make the first shard the slowest so completion order differs from shard order
+            time.sleep(0.05 if device == 'sw1' else 0)
+            return iter([
+                ['parent', 'child', 'child description', 'attribute', '2024-02-21 09:10', '2024-02-21 09:11'],
+                [device, 'Gi1/0/1', '', 'IF-MIB.ifHCInOctets', '1', '2'],
+            ])
+        api = MagicMock()
+        api.iter_series.side_effect = fake_iter_series
+
+        shards = series_shards(devices=['sw1', 'sw2', 'sw3'])
+        rows = list(iter_series_rows(api, shards, max_workers=2))
+        self.assertEqual([(r['parent'], r['time']) for r in rows], [
+            ('sw1', '2024-02-21 09:10'), ('sw1', '2024-02-21 09:11'),
+            ('sw2', '2024-02-21 09:10'), ('sw2', '2024-02-21 09:11'),
+            ('sw3', '2024-02-21 09:10'), ('sw3', '2024-02-21 09:11'),
+        ])
+        self.assertEqual(sorted(running), ['sw1', 'sw2', 'sw3'])
+
+        out = io.StringIO()
+        self.assertEqual(export_series(api, shards[:1], out), 2)
+        self.assertEqual(out.getvalue().splitlines()[0], 'parent,child,description,attribute,time,value')
+
+        out = io.StringIO()
+        export_series(api, shards[:1], out, fmt='ndjson')
+        self.assertEqual(json.loads(out.getvalue().splitlines()[1])['value'], '2')
+
+    @patch('akips.export.SPOOL_MAX_SIZE', 1)
+    def test_head_shard_streams(self):
+        first_row_seen = threading.Event()
+        finished_early = []
+
+        def fake_iter_series(get_dict=True, device='*', **kwargs):
+            yield HEADER
+            yield [device, 'Gi1/0/1', '', 'IF-MIB.ifHCInOctets', '1', '2']
+            if device == 'sw1':
+                # the head shard is still running when its first row is consumed
+                finished_early.append(not first_row_seen.wait(5))
+            yield [device, 'Gi1/0/2', 'x,"y"', 'IF-MIB.ifHCInOctets', '', '4']
+        api = MagicMock()
+        api.iter_series.side_effect = fake_iter_series
+
+        results = []
+        for shard, rows in iter_shard_results(api, series_shards(devices=['sw1', 'sw2']), max_workers=2):
+            for row in rows:
+                results.append(row)
+                first_row_seen.set()
+        self.assertEqual(finished_early, [False])
+        self.assertEqual(results[2], ['sw1', 'Gi1/0/2', 'x,"y"', 'IF-MIB.ifHCInOctets', '', '4'])
+        # the second shard went through a temporary file
+        self.assertEqual(results[3:], [HEADER, ['sw2', 'Gi1/0/1', '', 'IF-MIB.ifHCInOctets', '1', '2'],
+                                       ['sw2', 'Gi1/0/2', 'x,"y"', 'IF-MIB.ifHCInOctets', '', '4']])
+
+    def test_shard_error(self):
+        def fake_iter_series(get_dict=True, device='*', **kwargs):
+            yield HEADER
+            if device == 'sw2':
+                raise ValueError("bad shard")
+            yield [device, 'Gi1/0/1', '', 'IF-MIB.ifHCInOctets', '1', '2']
+        api = MagicMock()
+        api.iter_series.side_effect = fake_iter_series
+
+        rows = iter_series_rows(api, series_shards(devices=['sw1', 'sw2', 'sw3']), max_workers=3)
+        self.assertEqual([next(rows)['parent'], next(rows)['parent']], ['sw1', 'sw1'])
+        self.assertRaises(ValueError, next, rows)
@@ -0,0 +1,101 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS
+from akips.ipindex import IPIndex
+
+
+class IPIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.api = MagicMock()
+        self.api.get_ip_mapping.return_value = {
+            '10.0.0.1': 'sw1',
+            '10.0.0.2': 'sw1',
+            '10.0.1.1': 'sw2',
+            '2001:db8::1': 'rtr1',
+            'bogus': 'sw3',
+        }
+        self.index = IPIndex(self.api, refresh_interval=60, clock=lambda: self.now)
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup('10.0.1.1'), 'sw2')
+        self.assertEqual(self.index.lookup('2001:0db8::1'), 'rtr1')
+        self.assertIsNone(self.index.lookup('10.9.9.9'))
+        self.assertIsNone(self.index.lookup('not an ip'))
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.api.get_ip_mapping.call_count, 1)
+
+    def test_lookup_subnet(self):
+        self.assertEqual(self.index.lookup_subnet('10.0.0.0/24'), {'10.0.0.1': 'sw1', '10.0.0.2': 'sw1'})
+        self.assertEqual(list(self.index.lookup_subnet('10.0.0.0/16')), ['10.0.0.1', '10.0.0.2', '10.0.1.1'])
+        self.assertEqual(self.index.lookup_subnet('2001:db8::/32'), {'2001:db8::1': 'rtr1'})
+
+    def test_scheduled_refresh(self):
+        self.index.lookup('10.0.0.1')
+        self.now = 59
+        self.index.lookup('10.0.0.1')
+        self.assertEqual(self.api.get_ip_mapping.call_count, 1)
+        self.now = 60
+        self.index.lookup('10.0.0.1')
+        self.assertEqual(self.api.get_ip_mapping.call_count, 2)
+
+    def test_concurrent_stale_lookups(self):
+        self.index.lookup('10.0.0.1')
+        self.now = 60
+        started = threading.Event()
+        release = threading.Event()
+        mapping = self.api.get_ip_mapping.return_value
+
+        def slow_export():
+            started.set()
+            release.wait(5)
+            return dict(mapping, **{'10.0.0.1': 'sw9'})
+        self.api.get_ip_mapping.side_effect = slow_export
+
+        refresher = threading.Thread(target=self.index.lookup, args=('10.0.0.1',))
+        refresher.start()
+        self.assertTrue(started.wait(5))
+        results = []
+        workers = [threading.Thread(target=lambda: results.append(self.index.lookup('10.0.0.1')))
+                   for _ in range(8)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(5)
+        # the other lookups answered from the old copy while the export ran
+        self.assertEqual(results, ['sw1'] * 8)
+        release.set()
+        refresher.join(5)
+        self.assertEqual(self.api.get_ip_mapping.call_count, 2)
+        self.assertEqual(self.index.lookup('10.0.0.1'), 'sw9')
+
+    def test_failed_refresh_serves_old_copy(self):
+        self.index.lookup('10.0.0.1')
+        self.now = 60
+        self.api.get_ip_mapping.side_effect = ConnectionError("akips down")
+        self.assertEqual(self.index.lookup('10.0.0.1'), 'sw1')
+        self.assertEqual(self.index.lookup('10.0.0.1'), 'sw1')
+        self.assertEqual(self.api.get_ip_mapping.call_count, 2)
+        # retried after retry_interval
+        self.now = 120
+        self.index.lookup('10.0.0.1')
+        self.assertEqual(self.api.get_ip_mapping.call_count, 3)
+
+    def test_first_load_failure_raises(self):
+        self.api.get_ip_mapping.side_effect = ConnectionError("akips down")
+        self.assertRaises(ConnectionError, self.index.lookup, '10.0.0.1')
+
+    @patch('requests.Session.get')
+    def test_get_ip_mapping(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter([
+            "10.194.200.65,cisco-sw1", "10.194.200.65,cisco-sw2", "10.194.200.66,cisco-sw2", "",
+        ])
+
+        api = AKIPS('127.0.0.1')
+        mapping = api.get_ip_mapping()
+        self.assertEqual(mapping, {'10.194.200.65': 'cisco-sw1', '10.194.200.66': 'cisco-sw2'})
+        self.assertEqual(session_mock.call_args.kwargs['params']['function'], 'web_export_ip2name')
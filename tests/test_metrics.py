@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS, AkipsError
+from akips.metrics import MetricsCollector, RequestObserver, command_verb
+
+
+class RecordingObserver(RequestObserver):
+
+    def __init__(self):
+        self.requests = []
+        self.parses = []
+
+    def on_request(self, event):
+        self.requests.append(event)
+
+    def on_parse(self, event):
+        self.parses.append(event)
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_command_verb(self):
+        self.assertEqual(command_verb('/api-db/', {'cmds': 'mget * sw1 * *'}), 'mget')
+        self.assertEqual(command_verb('/api-script/', {'function': 'web_find_device_by_ip'}),
+                         'web_find_device_by_ip')
+
+    @patch('requests.Session.get')
+    def test_observer_events(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "sw1 = admin,user\nsw2 = admin\n"
+        session_mock.return_value.content = b"sw1 = admin,user\nsw2 = admin\n"
+
+        observer = RecordingObserver()
+        api = AKIPS('127.0.0.1', observers=[observer])
+        api.get_group_membership()
+        self.assertEqual(len(observer.requests), 1)
+        self.assertEqual(observer.requests[0].verb, 'mgroup')
+        self.assertEqual(observer.requests[0].lines, 2)
+        self.assertEqual(observer.requests[0].response_bytes, 29)
+        self.assertIsNone(observer.requests[0].error)
+        self.assertEqual(len(observer.parses), 1)
+        self.assertEqual(observer.parses[0].method, 'get_group_membership')
+        self.assertEqual(observer.parses[0].lines, 2)
+
+    @patch('requests.Session.get')
+    def test_collector_errors(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "ERROR: api-db invalid username/password"
+        session_mock.return_value.content = b"ERROR: api-db invalid username/password"
+
+        collector = MetricsCollector()
+        api = AKIPS('127.0.0.1')
+        api.add_observer(collector)
+        self.assertRaises(AkipsError, api.get_devices)
+        stats = collector.snapshot()['mget']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['errors'], {'AkipsError': 1})
+        output = collector.render()
+        self.assertIn('akips_requests_total{verb="mget"} 1', output)
+        self.assertIn('akips_request_errors_total{verb="mget",error="AkipsError"} 1', output)
+        self.assertIn('akips_request_duration_seconds_bucket{verb="mget",le="+Inf"} 1', output)
+
+    @patch('requests.Session.get')
+    def test_streamed_request(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.iter_lines.return_value = iter(["sw1 = admin", "sw2 = user"])
+
+        collector = MetricsCollector()
+        api = AKIPS('127.0.0.1', observers=[collector])
+        self.assertEqual(len(list(api.iter_group_membership())), 2)
+        stats = collector.snapshot()['mgroup']
+        self.assertEqual(stats['lines'], 2)
+        self.assertEqual(stats['response_bytes'], 23)
+
+    def test_truncate(self):
+        api = AKIPS('127.0.0.1')
+        api.debug_body_limit = 5
+        self.assertEqual(api._truncate('abcdefgh'), 'abcde... [3 more characters]')
+        self.assertEqual(api._truncate('abc'), 'abc')
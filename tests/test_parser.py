@@ -0,0 +1,40 @@
+import unittest
+from akips import parser
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_parse_mget(self):
+        lines = [
+            "sw1 sys SNMPv2-MIB.sysDescr = Cisco IOS Software, C3750",
+            "sw1 Gi1/0/1 IF-MIB.ifAlias =",
+            "sw1\tsys\tip4addr\t=\t10.0.0.1",
+            "",
+            "garbage",
+        ]
+        self.assertEqual(list(parser.parse_mget(lines)), [
+            ('sw1', 'sys', 'SNMPv2-MIB.sysDescr', 'Cisco IOS Software, C3750'),
+            ('sw1', 'Gi1/0/1', 'IF-MIB.ifAlias', ''),
+            ('sw1', 'sys', 'ip4addr', '10.0.0.1'),
+        ])
+
+    def test_parse_mgroup(self):
+        lines = ["sw1 = admin,Cisco,user", "bad line", ""]
+        self.assertEqual(list(parser.parse_mgroup(lines)), [('sw1', ['admin', 'Cisco', 'user'])])
+
+    def test_parse_events(self):
+        lines = ["1708524000 sw1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to down", "short line"]
+        events = list(parser.parse_events(lines))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['epoch'], '1708524000')
+        self.assertEqual(events[0]['details'], 'Changed to down')
+
+    def test_split_enum(self):
+        self.assertEqual(parser.split_enum('1,up,1484685257,1657029502,Gi1/0/1'),
+                         ['1', 'up', '1484685257', '1657029502', 'Gi1/0/1'])
+        self.assertIsNone(parser.split_enum('not an enum'))
+        self.assertIsNone(parser.split_enum('1,up,2,3,with space'))
+
+    def test_is_error(self):
+        self.assertTrue(parser.is_error('ERROR: api-db invalid username/password'))
+        self.assertFalse(parser.is_error('sw1 sys ip4addr = ERROR:'))
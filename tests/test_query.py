@@ -0,0 +1,66 @@
+import ipaddress
+import unittest
+from unittest.mock import MagicMock, patch
+from akips import AKIPS
+from akips.query import Query
+
+
+class QueryTest(unittest.TestCase):
+
+    def test_mget(self):
+        query = (Query.mget('enum').device('sw1.example.com').attribute('IF-MIB.ifOperStatus')
+                 .value('down').profile('Cisco').group('Core', 'Edge', mode='all').group('lab', mode='not'))
+        self.assertEqual(query.compile(), 'mget enum sw1.example.com * IF-MIB.ifOperStatus value down '
+                                          'profile Cisco all group Core Edge not group lab')
+        self.assertEqual(Query.mget().compile(), 'mget * * * *')
+
+    def test_escaping(self):
+        self.assertEqual(Query.mget().device('sw1', 'sw2.example.com').compile(),
+                         r'mget * /^(sw1|sw2\.example\.com)$/ * *')
+        self.assertEqual(Query.mget().child('Gi1/0/1').compile(), 'mget * * Gi1/0/1 *')
+        self.assertEqual(Query.mget().value('Building 5').compile(), r'mget * * * * value /^Building\s5$/')
+        self.assertEqual(Query.mget().value('1/2 3', regex=False).compile(), r'mget * * * * value /^1\/2\s3$/')
+        self.assertEqual(Query.mget().value(ipaddress.ip_address('10.0.0.1')).compile(),
+                         'mget * * * * value 10.0.0.1')
+        self.assertEqual(Query.mget().value(5).compile(), 'mget * * * * value 5')
+        self.assertEqual(Query.mget().attribute(regex=r'PING\.icmpState|SNMP\.snmpState').compile(),
+                         r'mget * * * /PING\.icmpState|SNMP\.snmpState/')
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Query.mget().group, 'bad group')
+        self.assertRaises(ValueError, Query.mget().profile, 'x profile y')
+        self.assertRaises(ValueError, Query.mget().device, regex='a b')
+        self.assertRaises(ValueError, Query.mget().device, regex='a/b')
+        self.assertRaises(ValueError, Query.mget().device, 'sw1', regex='sw')
+        self.assertRaises(ValueError, Query.mget().group, 'Core', mode='some')
+        self.assertRaises(ValueError, Query.mgroup().value, 'down')
+        self.assertRaises(ValueError, Query.cseries().profile, 'Cisco')
+        self.assertRaises(ValueError, Query.cseries, 'last1h; mget')
+
+    def test_mgroup_and_cseries(self):
+        self.assertEqual(Query.mgroup().device('sw1').group('Cisco').compile(), 'mgroup sw1 * any group Cisco')
+        query = Query.cseries('from 1708473600 to 1708477200').attribute('IF-MIB.ifHCInOctets')
+        self.assertEqual(query.compile(),
+                         'cseries avg time from 1708473600 to 1708477200 * * * IF-MIB.ifHCInOctets')
+
+    def test_immutable(self):
+        base = Query.mget('text')
+        base.device('sw1')
+        self.assertEqual(base.compile(), 'mget text * * *')
+        self.assertEqual(base.device('sw1'), Query.mget('text').device('sw1'))
+
+    @patch('requests.Session.get')
+    def test_run(self, session_mock: MagicMock):
+        session_mock.return_value.iter_lines.return_value = iter([
+            "sw1 Gi1/0/1 IF-MIB.ifOperStatus = 2,down,1708473600,1708473660,",
+            "sw2 Gi1/0/7 IF-MIB.ifOperStatus = 2,down,1708473600,1708473660,",
+        ])
+        api = AKIPS('127.0.0.1')
+        query = Query.mget('enum').attribute('IF-MIB.ifOperStatus').value('down', regex=True)
+        data = api.query(query)
+        self.assertEqual(session_mock.call_args.kwargs['params']['cmds'],
+                         'mget enum * * IF-MIB.ifOperStatus value /down/')
+        self.assertEqual(data['sw2']['Gi1/0/7']['IF-MIB.ifOperStatus'], '2,down,1708473600,1708473660,')
+
+        session_mock.return_value.iter_lines.return_value = iter(["sw1 = admin,Cisco"])
+        self.assertEqual(list(api.iter_query(Query.mgroup())), [('sw1', ['admin', 'Cisco'])])
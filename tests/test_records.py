@@ -0,0 +1,70 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+import pytz
+from akips import AKIPS
+from akips.records import Device, EnumValue, Event, UnreachableDevice
+
+UNREACHABLE = """192.168.248.54 ping4 PING.icmpState = 1,down,1484685257,1657029502,192.168.248.54
+192.168.248.54 sys SNMP.snmpState = 1,down,1484685257,1657029499,
+"""
+
+
+class RecordsTest(unittest.TestCase):
+
+    def test_slots(self):
+        event = Event('1708524000', 'sw1', 'Gi1/0/1', 'IF-MIB.ifOperStatus', 'enum', '0x1', 'Changed to down')
+        self.assertFalse(hasattr(event, '__dict__'))
+        self.assertEqual(event.epoch, 1708524000)
+        self.assertEqual(event.to_dict()['epoch'], '1708524000')
+
+    def test_lazy_datetime(self):
+        tz = pytz.timezone('America/New_York')
+        value = EnumValue.from_string('1,up,1484685257,1657029502,Gi1/0/1', tzinfo=tz)
+        self.assertEqual(value.created_epoch, 1484685257)
+        self.assertEqual(value.modified, datetime.fromtimestamp(1657029502, tz=tz))
+        self.assertIsNone(EnumValue.from_string('up'))
+
+    def test_device_round_trip(self):
+        attributes = {'ip4addr': '10.0.0.1', 'SNMPv2-MIB.sysName': 'sw1', 'SNMPv2-MIB.sysDescr': None,
+                      'SNMPv2-MIB.sysLocation': None}
+        device = Device.from_attributes('sw1', attributes)
+        self.assertEqual(device.to_dict(), attributes)
+        self.assertEqual(device, Device('sw1', ip4addr='10.0.0.1', sysName='sw1'))
+
+    @patch('requests.Session.get')
+    def test_get_unreachable_records(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = UNREACHABLE
+
+        api = AKIPS('127.0.0.1')
+        devices = api.get_unreachable(as_records=True)
+        device = devices['192.168.248.54']
+        self.assertIsInstance(device, UnreachableDevice)
+        self.assertEqual(device.ping_state, 'down')
+        self.assertEqual(device.snmp_state, 'down')
+        self.assertEqual(device.event_start_epoch, 1657029499)
+        self.assertEqual(device.event_start, datetime.fromtimestamp(1657029499, tz=api.tzinfo))
+
+    @patch('requests.Session.get')
+    def test_get_unreachable_child(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = UNREACHABLE
+
+        api = AKIPS('127.0.0.1')
+        devices = api.get_unreachable()
+        self.assertEqual(devices['192.168.248.54']['child'], 'sys')
+
+    @patch('requests.Session.get')
+    def test_get_events_records(self, session_mock: MagicMock):
+        session_mock.return_value.ok = True
+        session_mock.return_value.status_code = 200
+        session_mock.return_value.text = "1708524000 sw1 Gi1/0/1 IF-MIB.ifOperStatus enum 0x1 Changed to down\n"
+
+        api = AKIPS('127.0.0.1')
+        events = api.get_events(as_records=True)
+        self.assertEqual(events[0].epoch, 1708524000)
+        self.assertEqual(events[0].time.tzinfo.zone, 'America/New_York')
+        self.assertEqual(events[0].details, 'Changed to down')
@@ -0,0 +1,47 @@
+import unittest
+from akips import AkipsError
+from akips.columnar import np
+from akips.rollup import Rollup, iter_rollups
+
+HEADER = ['parent', 'child', 'child description', 'attribute']
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class RollupTest(unittest.TestCase):
+
+    def test_iter_rollups(self):
+        rows = [
+            HEADER + ['2024-02-21 09:58', '2024-02-21 09:59', '2024-02-21 10:00', '2024-02-21 10:01'],
+            ['sw1', 'Gi1/0/1', 'uplink', 'IF-MIB.ifHCInOctets', '1', '3', '', '10'],
+            ['sw2', 'Gi1/0/2', '', 'IF-MIB.ifHCInOctets', '', '', '', ''],
+        ]
+        first, second = iter_rollups(rows, percentiles=(50, 95), bucket=3600)
+        self.assertEqual((first.count, first.min, first.max), (3, 1.0, 10.0))
+        self.assertAlmostEqual(first.mean, 14 / 3)
+        self.assertEqual(first.percentiles[50], 3.0)
+        self.assertEqual(list(first.bucket_mean), [2.0, 10.0])
+        self.assertEqual(list(first.bucket_max), [3.0, 10.0])
+        self.assertEqual(first.peak_bucket, np.datetime64('2024-02-21T10:00'))
+        self.assertEqual(first.to_dict()['p95'], first.percentiles[95])
+        self.assertEqual(second.count, 0)
+        self.assertIsNone(second.mean)
+        self.assertIsNone(second.percentiles[95])
+        self.assertIsNone(second.peak_bucket)
+
+    def test_rollup_merges_requests(self):
+        rollup = Rollup(percentiles=(100,), bucket=3600)
+        rollup.add([HEADER + ['2024-02-21 09:59', '2024-02-21 10:00'],
+                    ['sw1', 'Gi1/0/1', 'uplink', 'IF-MIB.ifHCInOctets', '4', '10']])
+        rollup.add([HEADER + ['2024-02-21 10:01'],
+                    ['sw1', 'Gi1/0/1', 'uplink', 'IF-MIB.ifHCInOctets', '20']])
+        self.assertEqual(len(rollup), 1)
+        result, = rollup.results()
+        self.assertEqual(result.count, 3)
+        self.assertEqual(result.percentiles[100], 20.0)
+        self.assertEqual(list(result.bucket_mean), [4.0, 15.0])
+        self.assertEqual(result.peak_value, 15.0)
+
+    def test_bad_rows(self):
+        self.assertRaises(AkipsError, list, iter_rollups([['sw1', 'Gi1/0/1', '', 'x', '1']]))
+        rows = [HEADER + ['2024-02-21 09:59'], ['sw1', 'Gi1/0/1', '', 'x', '1', '2']]
+        self.assertRaises(AkipsError, list, iter_rollups(rows))
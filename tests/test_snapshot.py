@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import MagicMock
+from akips.snapshot import Snapshot
+
+
+def device(ip, sysname=None, location=None):
+    return {'ip4addr': ip, 'SNMPv2-MIB.sysName': sysname, 'SNMPv2-MIB.sysDescr': None,
+            'SNMPv2-MIB.sysLocation': location}
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = MagicMock()
+        self.api.get_devices.return_value = {
+            'sw1': device('10.0.0.1', 'sw1.example.com', 'Building A'),
+            'sw2': device('10.0.0.2', 'sw2.example.com', 'Building B'),
+        }
+        self.api.get_group_membership.return_value = {
+            'sw1': ['admin', 'Cisco', 'maintenance_mode'],
+            'sw2': ['admin', 'Cisco'],
+        }
+        self.snapshot = Snapshot()
+        self.snapshot.refresh(self.api)
+
+    def tearDown(self):
+        self.snapshot.close()
+
+    def test_queries(self):
+        self.assertEqual(self.snapshot.get_devices(), self.api.get_devices.return_value)
+        self.assertEqual(list(self.snapshot.find_by_ip('10.0.0.2')), ['sw2'])
+        self.assertEqual(list(self.snapshot.find_by_sysname('sw1.example.com')), ['sw1'])
+        self.assertEqual(list(self.snapshot.find_by_location('Building B')), ['sw2'])
+        self.assertIsNone(self.snapshot.get_device('sw9'))
+        self.assertEqual(self.snapshot.get_group_membership(), self.api.get_group_membership.return_value)
+        self.assertEqual(self.snapshot.get_group_membership(group='maintenance_mode'),
+                         {'sw1': ['admin', 'Cisco', 'maintenance_mode']})
+        self.assertIsNotNone(self.snapshot.refreshed)
+
+    def test_incremental_refresh(self):
+        self.api.get_devices.return_value = {
+            'sw1': device('10.0.0.1', 'sw1.example.com', 'Building C'),
+            'sw3': device('10.0.0.3'),
+        }
+        self.api.get_group_membership.return_value = {
+            'sw1': ['admin', 'Cisco'],
+            'sw2': ['admin', 'Cisco'],
+        }
+        changes = self.snapshot.refresh(self.api)
+        self.assertEqual(changes['devices'], {'added': 1, 'updated': 1, 'removed': 1})
+        self.assertEqual(changes['groups'], {'added': 0, 'updated': 1, 'removed': 0})
+        self.assertEqual(self.snapshot.get_device('sw1')['SNMPv2-MIB.sysLocation'], 'Building C')
+        self.assertEqual(self.snapshot.get_group_membership(device='sw1'), {'sw1': ['admin', 'Cisco']})
+
+    def test_refresh_without_data(self):
+        self.api.get_devices.return_value = None
+        changes = self.snapshot.refresh(self.api)
+        self.assertNotIn('devices', changes)
+        self.assertEqual(len(self.snapshot.get_devices()), 2)
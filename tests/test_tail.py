@@ -0,0 +1,38 @@
+import unittest
+from unittest.mock import MagicMock
+from akips.tail import EventTailer
+
+
+def make_event(epoch, details='Changed to down'):
+    return {'epoch': str(epoch), 'parent': 'sw1', 'child': 'Gi1/0/1', 'attribute': 'IF-MIB.ifOperStatus',
+            'type': 'enum', 'flags': '0x1', 'details': details}
+
+
+class EventTailerTest(unittest.TestCase):
+
+    def test_poll_dedupes_overlap(self):
+        api = MagicMock()
+        clock = MagicMock(side_effect=[1000, 1030, 1060])
+        tailer = EventTailer(api, overlap=60, clock=clock)
+
+        api.iter_events.return_value = iter([make_event(990), make_event(1025)])
+        self.assertEqual(len(tailer.poll()), 2)
+        self.assertEqual(api.iter_events.call_args.kwargs['period'], 'from 940 to 1030')
+        self.assertEqual(tailer.cursor, 1030)
+
+        # the second window overlaps the first, only the new event comes back
+        api.iter_events.return_value = iter([make_event(1025), make_event(1050, 'Changed to up')])
+        events = tailer.poll()
+        self.assertEqual(api.iter_events.call_args.kwargs['period'], 'from 970 to 1060')
+        self.assertEqual([e['details'] for e in events], ['Changed to up'])
+
+    def test_follow_sleeps_between_polls(self):
+        api = MagicMock()
+        api.iter_events.side_effect = [iter([make_event(100)]), iter([]), iter([make_event(200)])]
+        sleep = MagicMock()
+        tailer = EventTailer(api, start=100, interval=5, clock=lambda: 300, sleep=sleep)
+
+        events = list(tailer.follow(max_polls=3))
+        self.assertEqual([e['epoch'] for e in events], ['100', '200'])
+        self.assertEqual(sleep.call_count, 2)
+        sleep.assert_called_with(5)
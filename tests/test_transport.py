@@ -0,0 +1,105 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import requests
+from akips import AKIPS
+
+
+def ok_response(text):
+    response = MagicMock()
+    response.text = text
+    return response
+
+
+def status_response(code):
+    response = MagicMock()
+    response.status_code = code
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"{code} error", response=response)
+    return response
+
+
+@patch('akips.time.sleep')
+class TransportTest(unittest.TestCase):
+
+    @patch('requests.Session.get')
+    def test_read_retried(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.side_effect = [
+            requests.exceptions.ConnectionError("connection refused"),
+            status_response(503),
+            ok_response("sw1 = admin\n"),
+        ]
+        api = AKIPS('127.0.0.1', retries=3, backoff_factor=0.5)
+        self.assertEqual(api.get_group_membership(), {'sw1': ['admin']})
+        self.assertEqual(session_mock.call_count, 3)
+        self.assertEqual(sleep_mock.call_count, 2)
+        self.assertLessEqual(sleep_mock.call_args_list[1].args[0], 1.0)
+
+    @patch('requests.Session.get')
+    def test_retries_exhausted(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.side_effect = requests.exceptions.ReadTimeout("read timed out")
+        api = AKIPS('127.0.0.1', retries=2)
+        self.assertRaises(requests.exceptions.ReadTimeout, api.get_devices)
+        self.assertEqual(session_mock.call_count, 3)
+
+    @patch('requests.Session.get')
+    def test_client_error_not_retried(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.return_value = status_response(404)
+        api = AKIPS('127.0.0.1')
+        self.assertRaises(requests.exceptions.HTTPError, api.get_devices)
+        self.assertEqual(session_mock.call_count, 1)
+        self.assertFalse(sleep_mock.called)
+
+    @patch('requests.Session.get')
+    def test_failed_stream_closed(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        retried = status_response(503)
+        failed = status_response(500)
+        session_mock.side_effect = [retried, failed]
+        api = AKIPS('127.0.0.1', retries=3)
+        self.assertRaises(requests.exceptions.HTTPError, list, api.iter_devices())
+        self.assertTrue(retried.close.called)
+        self.assertTrue(failed.close.called)
+
+    @patch('requests.Session.get')
+    def test_server_url(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.return_value = ok_response("sw1 = admin\n")
+        AKIPS('127.0.0.1').get_group_membership()
+        self.assertEqual(session_mock.call_args.args[0], 'https://127.0.0.1/api-db/')
+        AKIPS('http://127.0.0.1:8080/').get_group_membership()
+        self.assertEqual(session_mock.call_args.args[0], 'http://127.0.0.1:8080/api-db/')
+
+    @patch('requests.Session.get')
+    def test_write_retry_opt_in(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.side_effect = requests.exceptions.ReadTimeout("read timed out")
+        api = AKIPS('127.0.0.1')
+        self.assertRaises(requests.exceptions.ReadTimeout, api.set_group_membership,
+                          'sw1', 'maintenance_mode', 'assign')
+        self.assertEqual(session_mock.call_count, 1)
+
+        session_mock.reset_mock()
+        session_mock.side_effect = [requests.exceptions.ConnectionError("reset"), ok_response("")]
+        api = AKIPS('127.0.0.1', retry_writes=True)
+        self.assertIsNone(api.set_group_membership('sw1', 'maintenance_mode', 'assign'))
+        self.assertEqual(session_mock.call_count, 2)
+
+    @patch('requests.Session.get')
+    def test_timeout_and_pool(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        session_mock.return_value = ok_response("")
+        api = AKIPS('127.0.0.1', timeout=(3.05, 60), pool_maxsize=32)
+        api.get_devices()
+        self.assertEqual(session_mock.call_args.kwargs['timeout'], (3.05, 60))
+        self.assertEqual(api.session.get_adapter('https://127.0.0.1')._pool_maxsize, 32)
+
+    @patch('requests.Session.get')
+    def test_shared_client_threads(self, session_mock: MagicMock, sleep_mock: MagicMock):
+        def fake_get(url, params=None, **kwargs):
+            name = params['cmds'].split()[2]
+            return ok_response(f"{name} sys ip4addr = {name}\n")
+        session_mock.side_effect = fake_get
+
+        api = AKIPS('127.0.0.1', pool_maxsize=8)
+        names = [f'10.0.0.{i}' for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(api.get_device, names))
+        for name, device in zip(names, results):
+            self.assertEqual(device['name'], name)
+            self.assertEqual(device['sys']['ip4addr'], name)